@@ -1,12 +1,18 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+from src.bundle import build_bundle
+
 block_cipher = None
 
+# The game loads its images, sounds and font from the asset bundle, so only the window icon is needed loose
+build_bundle('assets', 'assets.pack')
+
 
 a = Analysis(['src\\control.py'],
              pathex=[],
              binaries=[],
-             datas=[('assets', 'assets'), ('surveys/example.survey', 'surveys')],
+             datas=[('assets.pack', '.'), ('assets/images/icon.png', 'assets/images'),
+                    ('surveys/example.survey', 'surveys')],
              hiddenimports=[],
              hookspath=[],
              runtime_hooks=[],
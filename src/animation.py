@@ -0,0 +1,53 @@
+from time import monotonic
+
+# The clock all animations are timed with - replaceable so animations can be driven by simulated time
+clock = monotonic
+
+
+def set_clock(new_clock):
+    """
+    Sets the clock all animations are timed with
+
+    :param new_clock: function with no parameters returning the current time in seconds
+    """
+    global clock
+    clock = new_clock
+
+
+def now():
+    """
+    Gets the current animation time
+
+    :return: the time in seconds
+    """
+    return clock()
+
+
+# Easing curves map the linear progress of an animation (0 to 1) to the eased progress (0 to 1)
+def linear(progress):
+    return progress
+
+
+def ease_in(progress):
+    return progress * progress
+
+
+def ease_out(progress):
+    return 1 - (1 - progress) * (1 - progress)
+
+
+def ease_in_out(progress):
+    return progress * progress * (3 - 2 * progress)
+
+
+def lerp(start, end, progress):
+    """
+    Interpolates between two values
+
+    :param start: the value at progress 0
+    :param end: the value at progress 1
+    :param progress: how far between the values to go
+
+    :return: the interpolated value
+    """
+    return start + (end - start) * progress
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import struct
+
+import pygame
+
+
+class ScaledImageCache:
+    """
+    A cache on disk of images that are already scaled (and composited) for a resolution.
+    Entries are stored as raw pixels so loading them needs no decoding or scaling.
+    """
+
+    # Increase whenever the way cached images are built changes so old entries are rebuilt
+    VERSION = 2
+
+    _MAGIC = b"FEUD"
+    _HEADER = struct.Struct("<4sHBII32s")
+
+    def __init__(self, directory):
+        """
+        Creates a cache stored in the given directory (made when first saving to it)
+
+        :param directory: the directory for the cache files
+        """
+        self.directory = directory
+
+    def _key(self, name, size, source_digests):
+        """
+        Gets the digest identifying a cached image from its name, target size and source file digests
+
+        :return: the digest or None if a source file can't be read
+        """
+        if None in source_digests:
+            return None
+        digest = hashlib.blake2b(digest_size=32)
+        digest.update("{}|{}|{}x{}".format(self.VERSION, name, size[0], size[1]).encode())
+        for source_digest in source_digests:
+            digest.update(source_digest)
+        return digest.digest()
+
+    def _path(self, name, size):
+        return os.path.join(self.directory, "{}_{}x{}.raw".format(name, size[0], size[1]))
+
+    def get(self, name, size, source_digests, alpha, build):
+        """
+        Gets a scaled image from the cache or builds it and stores it in the cache.
+        Entries whose source files changed are rebuilt.
+
+        :param name: the unique name of the image
+        :param size: the resolution the image is scaled for (tuple of ints)
+        :param source_digests: digests of all the files the image is built from (None for a file that can't be read)
+        :param alpha: whether the image has per pixel alpha
+        :param build: function with no parameters that builds the scaled image
+
+        :return: the scaled and converted image
+        """
+        key = self._key(name, size, source_digests)
+        path = self._path(name, size)
+        if key is not None:
+            image = self._load(path, key, alpha)
+            if image is not None:
+                return image
+        image = build()
+        if key is not None:
+            self._save(path, key, alpha, image)
+        return image
+
+    def find(self, name, size, source_digests, alpha):
+        """
+        Gets a scaled image from the cache without building it when missing
+
+        :return: the scaled and converted image or None if it is not cached
+        """
+        key = self._key(name, size, source_digests)
+        if key is None:
+            return None
+        return self._load(self._path(name, size), key, alpha)
+
+    def _load(self, path, key, alpha):
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+        if len(data) < self._HEADER.size:
+            return None
+        magic, version, has_alpha, width, height, entry_key = self._HEADER.unpack_from(data)
+        if magic != self._MAGIC or version != self.VERSION or has_alpha != alpha or entry_key != key:
+            return None
+        pixels = memoryview(data)[self._HEADER.size:]
+        if len(pixels) != width * height * (4 if alpha else 3):
+            return None
+        image = pygame.image.frombuffer(pixels, (width, height), "RGBA" if alpha else "RGB")
+        if alpha:
+            return image.convert_alpha()
+        return image.convert()
+
+    def _save(self, path, key, alpha, image):
+        header = self._HEADER.pack(self._MAGIC, self.VERSION, alpha, image.get_width(), image.get_height(), key)
+        pixels = pygame.image.tostring(image, "RGBA" if alpha else "RGB")
+        temp_path = path + ".tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, "wb") as file:
+                file.write(header)
+                file.write(pixels)
+            # Replace in one step so a half written entry is never loaded
+            os.replace(temp_path, path)
+        except OSError:
+            print("Path (" + path + ") could not be saved to")
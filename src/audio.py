@@ -1,6 +1,8 @@
-from pygame.mixer import Sound
+from threading import Event, Thread
 
-from src.constants import ASSET_DIR
+from src import profiling
+from src.bundle import Assets
+from src.constants import ASSET_DIR, ASSET_BUNDLE
 
 
 class AudioManager:
@@ -8,27 +10,51 @@ class AudioManager:
     Handles the sound effects for the game
     """
 
+    SOUND_FILES = ("correct", "short_wrong", "long_wrong", "try_again", "reveal")
+
     def __init__(self):
-        self.correct_sound = Sound(ASSET_DIR + r"\sounds\correct.wav")
-        self.short_wrong_sound = Sound(ASSET_DIR + r"\sounds\short_wrong.wav")
-        self.long_wrong_sound = Sound(ASSET_DIR + r"\sounds\long_wrong.wav")
-        self.try_again_sound = Sound(ASSET_DIR + r"\sounds\try_again.wav")
-        self.reveal_sound = Sound(ASSET_DIR + r"\sounds\reveal.wav")
+        # Decoded in the background so the windows can show sooner
+        self._sounds = dict()
+        self._assets = Assets(ASSET_DIR, ASSET_BUNDLE)
+        self._loaded = Event()
+        Thread(target=self._load_sounds, daemon=True).start()
+        # Functions called with the name of each sound played (such as "strike")
+        self.sound_listeners = []
+
+    def _load_sounds(self):
+        try:
+            for name in self.SOUND_FILES:
+                with profiling.phase("sound " + name):
+                    self._sounds[name] = self._assets.sound("sounds/{}.wav".format(name))
+        finally:
+            # Sounds that failed to load raise when played rather than waiting forever
+            self._loaded.set()
+
+    @property
+    def loaded(self):
+        return self._loaded.is_set()
+
+    def _play(self, sound, name):
+        # Only waits if a sound is played before they have all loaded
+        self._loaded.wait()
+        self._sounds[sound].play()
+        for listener in self.sound_listeners:
+            listener(name)
 
     def play_strike(self):
-        self.long_wrong_sound.play()
+        self._play("long_wrong", "strike")
 
     def play_correct(self):
-        self.correct_sound.play()
+        self._play("correct", "correct")
 
     def play_fm_reveal(self):
-        self.reveal_sound.play()
+        self._play("reveal", "fm_reveal")
 
     def play_fm_wrong(self):
-        self.short_wrong_sound.play()
+        self._play("short_wrong", "fm_wrong")
 
     def play_try_again(self):
-        self.try_again_sound.play()
+        self._play("try_again", "try_again")
 
     def play_timer_end(self):
-        self.long_wrong_sound.play()
+        self._play("long_wrong", "timer_end")
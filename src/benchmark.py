@@ -0,0 +1,296 @@
+import json
+import os
+import platform
+import sys
+from argparse import ArgumentParser
+from multiprocessing import Pool, freeze_support
+from time import perf_counter
+
+import pygame
+from pygame.math import Vector2
+
+from src import animation
+from src.constants import GameState, ASSET_BUNDLE
+from src.display import GraphicsManager, use_headless_drivers
+
+# Increase whenever the results change meaning so comparisons across versions can be refused
+FORMAT_VERSION = 1
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "1440p": (2560, 1440), "4k": (3840, 2160)}
+
+MAIN_RESPONSES = (("Pizza", 38), ("Hamburgers", 21), ("Ice cream", 12), ("Spaghetti", 9), ("Tacos", 7),
+                  ("Fried chicken", 5), ("Sushi", 4), ("Chocolate cake", 2))
+FAST_MONEY_RESPONSES = (("Dog", 43), ("Pencil", 28), ("Monday", 31), ("Blue", 25), ("Apple", 50),
+                        ("Baseball", 19), ("Coffee", 37), ("Summer", 22), ("Car keys", 15), ("Pillow", 11))
+
+
+class SimulatedClock:
+    """
+    An animation clock that only moves when told to, so every run animates over the same frames however long they
+    take to render
+    """
+
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+    def advance(self, seconds):
+        self.time += seconds
+
+
+class _NoWaitClock:
+    """
+    Stands in for the display's frame rate clock so frames are rendered back to back
+    """
+
+    def tick(self, frame_rate=0):
+        return 0
+
+
+class ScenarioRunner:
+    """
+    Renders the frames of a scenario, advancing the animation clock one frame's time per frame
+    """
+
+    def __init__(self, manager, clock):
+        self.manager = manager
+        self.clock = clock
+        self.frame_times = list()
+
+    def frames(self, state, seconds, timed=True):
+        """
+        Renders frames for the given time
+
+        :param state: the game state to render
+        :param seconds: the simulated time to render for
+        :param timed: whether the frames count towards the results (untimed frames get the board ready)
+        """
+        frame_seconds = 1 / self.manager.frame_rate
+        for _ in range(max(1, round(seconds * self.manager.frame_rate))):
+            start = perf_counter()
+            self.manager.update(state)
+            if timed:
+                self.frame_times.append(perf_counter() - start)
+            self.clock.advance(frame_seconds)
+
+
+def _fill_main_board(runner):
+    manager = runner.manager
+    manager.logo_split.open()
+    runner.frames(GameState.PREPARING, manager.logo_split.SPLIT_TIME, timed=False)
+    for card, (phrase, count) in zip(manager.main_cards, MAIN_RESPONSES):
+        card.phrase = phrase
+        card.count = count
+    manager.team_1_score.text = "120"
+    manager.team_2_score.text = "85"
+    runner.frames(GameState.MAIN_GAME, 1, timed=False)
+
+
+def idle_board(runner):
+    _fill_main_board(runner)
+    runner.frames(GameState.MAIN_GAME, 5)
+
+
+def main_card_reveal(runner):
+    _fill_main_board(runner)
+    score = 0
+    for card, (_, count) in zip(runner.manager.main_cards, MAIN_RESPONSES):
+        card.reveal()
+        score += count
+        runner.manager.master_score.text = str(score)
+        runner.frames(GameState.MAIN_GAME, .5)
+
+
+def triple_strike(runner):
+    _fill_main_board(runner)
+    runner.manager.strikes.show_strikes(3)
+    runner.frames(GameState.MAIN_GAME, runner.manager.strikes.SHOW_TIME + .5)
+
+
+def logo_split(runner):
+    split_time = runner.manager.logo_split.SPLIT_TIME
+    runner.frames(GameState.PREPARING, .5, timed=False)
+    runner.manager.logo_split.open()
+    runner.frames(GameState.PREPARING, split_time + .5)
+    runner.manager.logo_split.close()
+    runner.frames(GameState.PREPARING, split_time + .5)
+
+
+def fast_money_reveal(runner):
+    manager = runner.manager
+    manager.logo_split.open()
+    runner.frames(GameState.FAST_MONEY, manager.logo_split.SPLIT_TIME, timed=False)
+    total = 0
+    for card, (phrase, count) in zip(manager.fm_cards, FAST_MONEY_RESPONSES):
+        card.phrase = phrase
+        card.count = count
+        card.reveal_phrase()
+        runner.frames(GameState.FAST_MONEY, card.PHRASE_REVEAL_TIME + card.HALF_FLASH_TIME)
+        card.reveal_value()
+        total += count
+        manager.fm_points.text = str(total)
+        runner.frames(GameState.FAST_MONEY, .5)
+
+
+SCENARIOS = {"idle_board": idle_board, "main_card_reveal": main_card_reveal, "triple_strike": triple_strike,
+             "logo_split": logo_split, "fast_money_reveal": fast_money_reveal}
+
+
+def _peak_memory():
+    """
+    :return: the most memory the process has used in bytes or None if it can't be found
+    """
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                         ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes except on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _percentile(ordered, percent):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def run_scenario(resolution_name, scenario_name, frame_rate, dirty_rendering, prerender_animations):
+    """
+    Runs one scenario at one resolution (each run is in a fresh process so their peak memory is their own)
+
+    :return: dict of the results
+    """
+    use_headless_drivers()
+    pygame.init()
+    clock = SimulatedClock()
+    animation.set_clock(clock)
+    load_start = perf_counter()
+    manager = GraphicsManager(Vector2(RESOLUTIONS[resolution_name]), dirty_rendering=dirty_rendering, headless=True,
+                              frame_rate=frame_rate, prerender_animations=prerender_animations)
+    manager.clock = _NoWaitClock()
+    manager.wait_for_assets()
+    load_time = perf_counter() - load_start
+
+    runner = ScenarioRunner(manager, clock)
+    SCENARIOS[scenario_name](runner)
+    manager.close()
+    pygame.quit()
+
+    ordered = sorted(runner.frame_times)
+    total = sum(ordered)
+    peak_memory = _peak_memory()
+    return {"resolution": resolution_name, "scenario": scenario_name, "frames": len(ordered),
+            "load_ms": load_time * 1000, "mean_ms": total / len(ordered) * 1000,
+            "p50_ms": _percentile(ordered, 50) * 1000, "p95_ms": _percentile(ordered, 95) * 1000,
+            "p99_ms": _percentile(ordered, 99) * 1000, "max_ms": ordered[-1] * 1000,
+            "frames_per_sec": len(ordered) / total if total else None,
+            "peak_memory_mb": peak_memory / 2 ** 20 if peak_memory is not None else None}
+
+
+def run_benchmarks(resolutions, scenarios, frame_rate=60, dirty_rendering=True, prerender_animations=False):
+    """
+    Runs every scenario at every resolution
+
+    :return: dict of the results and the settings they were run with, ready to save as JSON
+    """
+    runs = [(resolution, scenario, frame_rate, dirty_rendering, prerender_animations)
+            for resolution in resolutions for scenario in scenarios]
+    with Pool(1, maxtasksperchild=1) as pool:
+        results = list()
+        for run in runs:
+            result = pool.apply(run_scenario, run)
+            print("{resolution:>6} {scenario:<18} p50 {p50_ms:7.2f} p95 {p95_ms:7.2f} p99 {p99_ms:7.2f} "
+                  "max {max_ms:7.2f} ms {frames_per_sec:8.1f} fps {memory} MB".format(
+                      memory="?" if result["peak_memory_mb"] is None else round(result["peak_memory_mb"]), **result))
+            results.append(result)
+    # Loading from the bundle or the loose asset files changes the load times
+    return {"version": FORMAT_VERSION, "python": platform.python_version(), "pygame": pygame.version.ver,
+            "platform": platform.platform(), "asset_bundle": os.path.exists(ASSET_BUNDLE), "frame_rate": frame_rate,
+            "dirty_rendering": dirty_rendering, "prerender_animations": prerender_animations, "results": results}
+
+
+def compare(baseline, current, threshold):
+    """
+    Compares two sets of benchmark results
+
+    :param baseline: the results to compare against
+    :param current: the new results
+    :param threshold: the percentage the p95 frame time may grow (or the throughput fall) before it is a regression
+
+    :return: tuple of the report lines and the number of regressions
+    """
+    if baseline["version"] != current["version"]:
+        raise ValueError("The results are from different benchmark versions")
+    baseline_results = {(result["resolution"], result["scenario"]): result for result in baseline["results"]}
+    lines = ["{:>6} {:<18} {:>16} {:>16}".format("", "", "p95 ms", "fps")]
+    regressions = 0
+    for result in current["results"]:
+        old = baseline_results.get((result["resolution"], result["scenario"]))
+        if old is None:
+            continue
+        p95_change = (result["p95_ms"] / old["p95_ms"] - 1) * 100
+        fps_change = (result["frames_per_sec"] / old["frames_per_sec"] - 1) * 100
+        regressed = p95_change > threshold or fps_change < -threshold
+        regressions += regressed
+        lines.append("{:>6} {:<18} {:7.2f} {:+7.1f}% {:7.1f} {:+7.1f}%{}".format(
+            result["resolution"], result["scenario"], result["p95_ms"], p95_change, result["frames_per_sec"],
+            fps_change, "  REGRESSION" if regressed else ""))
+    return lines, regressions
+
+
+if __name__ == '__main__':
+    freeze_support()
+    parser = ArgumentParser(description="Benchmarks the display rendering scripted scenarios headlessly (assets are "
+                                        "loaded from {} if it has been built, otherwise from the asset files)".format(
+                                            ASSET_BUNDLE))
+    parser.add_argument("--resolutions", default=",".join(RESOLUTIONS),
+                        help="comma separated resolutions to run at (from {})".format(", ".join(RESOLUTIONS)))
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="comma separated scenarios to run (from {})".format(", ".join(SCENARIOS)))
+    parser.add_argument("--fps", type=int, default=60, help="the frame rate animations are stepped at")
+    parser.add_argument("--full-redraw", action="store_true", help="redraw the whole screen every frame")
+    parser.add_argument("--prerender-animations", action="store_true", help="pre-render card animations")
+    parser.add_argument("--json", metavar="FILE", help="save the results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two saved results instead of running (exits with 1 on a regression)")
+    parser.add_argument("--threshold", type=float, default=10, help="the percentage change counted as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as file:
+            baseline_results = json.load(file)
+        with open(args.compare[1]) as file:
+            current_results = json.load(file)
+        report, regression_count = compare(baseline_results, current_results, args.threshold)
+        print("\n".join(report))
+        sys.exit(1 if regression_count else 0)
+
+    for name in args.resolutions.split(","):
+        if name not in RESOLUTIONS:
+            parser.error("Unknown resolution: {}".format(name))
+    for name in args.scenarios.split(","):
+        if name not in SCENARIOS:
+            parser.error("Unknown scenario: {}".format(name))
+    results = run_benchmarks(args.resolutions.split(","), args.scenarios.split(","), args.fps, not args.full_redraw,
+                             args.prerender_animations)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
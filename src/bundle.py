@@ -0,0 +1,252 @@
+import hashlib
+import io
+import json
+import mmap
+import os
+import struct
+import wave
+from argparse import ArgumentParser
+
+import pygame
+from pygame.mixer import Sound
+
+from src.constants import ASSET_BUNDLE
+
+
+# The bundle file starts with a header and an index (UTF-8 JSON) followed by the data of each asset.
+# Images are stored as decoded pixels, sounds as samples already in the mixer's format and fonts as their file.
+_MAGIC = b"FEUDPACK"
+_VERSION = 1
+# magic, version, index length
+_HEADER = struct.Struct("<8sHI")
+# Asset data starts on a multiple of this many bytes
+_ALIGNMENT = 16
+
+IMAGE_EXTENSIONS = (".png",)
+SOUND_EXTENSIONS = (".wav",)
+FONT_EXTENSIONS = (".ttf",)
+
+
+class AssetBundle:
+    """
+    A packed file of every asset, memory mapped so images and sounds are made straight from its bytes without decoding
+    """
+
+    def __init__(self, path):
+        """
+        :param path: the path of the bundle file
+
+        :raises ValueError: if the file is not an asset bundle
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_length = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError("Not an asset bundle: {}".format(path))
+        self.index = json.loads(bytes(self._map[_HEADER.size:_HEADER.size + index_length]).decode())
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def data(self, name):
+        """
+        :return: a view of the stored bytes of the asset (valid until the bundle is closed)
+        """
+        entry = self.index[name]
+        return memoryview(self._map)[entry["offset"]:entry["offset"] + entry["length"]]
+
+    def digest(self, name):
+        """
+        :return: the digest of the asset's original file
+        """
+        return bytes.fromhex(self.index[name]["digest"])
+
+    def image(self, name):
+        """
+        Gets an image that uses the bundle's memory for its pixels, so copy it before drawing on it
+        """
+        entry = self.index[name]
+        image = pygame.image.frombuffer(self.data(name), tuple(entry["size"]), entry["format"])
+        if entry["colorkey"] is not None:
+            image.set_colorkey(entry["colorkey"])
+        return image
+
+    def sound(self, name):
+        entry = self.index[name]
+        samples = self.data(name)
+        frequency, size, channels = entry["mixer"]
+        if pygame.mixer.get_init() == (frequency, size, channels):
+            return Sound(buffer=samples)
+        # The mixer was started with another format so let it convert the samples
+        return Sound(file=_to_wav(samples, frequency, size, channels))
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class Assets:
+    """
+    Loads the game's assets from the asset bundle if there is one, otherwise (or for assets not in the bundle) from the
+    loose files in the assets directory
+    """
+
+    def __init__(self, directory, bundle_path=None):
+        """
+        :param directory: the assets directory
+        :param bundle_path: the path of the asset bundle
+        """
+        self.directory = directory
+        self.bundle = None
+        if bundle_path and os.path.exists(bundle_path):
+            try:
+                self.bundle = AssetBundle(bundle_path)
+            except (OSError, ValueError) as error:
+                print("The asset bundle could not be used, loading the asset files instead: {}".format(error))
+
+    def path(self, name):
+        """
+        Gets the path of an asset's loose file
+
+        :param name: the name of the asset (its path in the assets directory with forward slashes)
+        """
+        return os.path.join(self.directory, *name.split("/"))
+
+    def _in_bundle(self, name):
+        return self.bundle is not None and name in self.bundle
+
+    def digest(self, name):
+        """
+        Gets the digest of an asset's contents for telling when it changes
+
+        :return: the digest or None if the asset can't be read
+        """
+        if self._in_bundle(name):
+            return self.bundle.digest(name)
+        try:
+            with open(self.path(name), "rb") as file:
+                return hashlib.blake2b(file.read(), digest_size=32).digest()
+        except OSError:
+            return None
+
+    def image(self, name):
+        """
+        Gets an image. Images from the bundle use its memory for their pixels, so copy them before drawing on them.
+        """
+        if self._in_bundle(name):
+            return self.bundle.image(name)
+        return pygame.image.load(self.path(name))
+
+    def sound(self, name):
+        if self._in_bundle(name):
+            return self.bundle.sound(name)
+        return Sound(self.path(name))
+
+    def font_data(self, name):
+        """
+        :return: the contents of a font file from the bundle or None to load it from its loose file
+        """
+        if self._in_bundle(name):
+            return bytes(self.bundle.data(name))
+        return None
+
+
+def _to_wav(samples, frequency, size, channels):
+    """
+    Wraps samples in a WAV file so the mixer can load them in a different format
+    """
+    file = io.BytesIO()
+    with wave.open(file, "wb") as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(abs(size) // 8)
+        writer.setframerate(frequency)
+        writer.writeframes(samples)
+    file.seek(0)
+    return file
+
+
+def _encode(path, extension):
+    """
+    Decodes an asset file into the form it is stored in the bundle
+
+    :return: tuple of the index entry (without the offset and length) and the bytes to store
+    """
+    if extension in IMAGE_EXTENSIONS:
+        image = pygame.image.load(path)
+        image_format = "RGBA" if image.get_flags() & pygame.SRCALPHA else "RGB"
+        colorkey = image.get_colorkey()
+        return {"type": "image", "size": image.get_size(), "format": image_format,
+                "colorkey": tuple(colorkey) if colorkey else None}, pygame.image.tostring(image, image_format)
+    if extension in SOUND_EXTENSIONS:
+        return {"type": "sound", "mixer": pygame.mixer.get_init()}, Sound(path).get_raw()
+    with open(path, "rb") as file:
+        return {"type": "font"}, file.read()
+
+
+def build_bundle(asset_directory, bundle_path):
+    """
+    Packs the images, sounds and fonts in the assets directory into an asset bundle.
+    Sounds are stored in the format the mixer is started with by default, as the game starts it.
+
+    :param asset_directory: the assets directory
+    :param bundle_path: the path of the bundle file to create (or replace)
+
+    :return: the number of assets packed
+    """
+    pygame.mixer.init()
+    if abs(pygame.mixer.get_init()[1]) not in (8, 16):
+        raise ValueError("Sounds can only be packed as 8 or 16 bit samples")
+    extensions = IMAGE_EXTENSIONS + SOUND_EXTENSIONS + FONT_EXTENSIONS
+    index = dict()
+    blobs = list()
+    for directory, _, filenames in sorted(os.walk(asset_directory)):
+        for filename in sorted(filenames):
+            extension = os.path.splitext(filename)[1].lower()
+            if extension not in extensions:
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, asset_directory).replace(os.sep, "/")
+            entry, data = _encode(path, extension)
+            with open(path, "rb") as file:
+                entry["digest"] = hashlib.blake2b(file.read(), digest_size=32).hexdigest()
+            index[name] = entry
+            blobs.append((name, data))
+
+    # The offsets depend on the index's length, which depends on the offsets, so lay out until it fits
+    index_length = 0
+    while True:
+        offset = _HEADER.size + index_length
+        for name, data in blobs:
+            offset += -offset % _ALIGNMENT
+            index[name]["offset"] = offset
+            index[name]["length"] = len(data)
+            offset += len(data)
+        index_bytes = json.dumps(index).encode()
+        if len(index_bytes) <= index_length:
+            break
+        index_length = len(index_bytes)
+    index_bytes = index_bytes.ljust(index_length)
+
+    temp_path = bundle_path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, index_length))
+        file.write(index_bytes)
+        for name, data in blobs:
+            file.write(bytes(index[name]["offset"] - file.tell()))
+            file.write(data)
+    # Replace in one step so the game never opens a half written bundle
+    os.replace(temp_path, bundle_path)
+    return len(blobs)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Packs the game's assets into an asset bundle")
+    parser.add_argument("--assets", default="assets", help="the assets directory")
+    parser.add_argument("--output", default=ASSET_BUNDLE, help="the bundle file to create")
+    args = parser.parse_args()
+
+    pygame.init()
+    count = build_bundle(args.assets, args.output)
+    print("Packed {} assets into {} ({:.1f} MB)".format(count, args.output, os.path.getsize(args.output) / 1e6))
@@ -18,10 +18,15 @@ class GameState(Enum):
 
 
 # Assets
-ASSET_DIR = r"assets\\"
+ASSET_DIR = "assets"
+# Built from the assets directory with python -m src.bundle
+ASSET_BUNDLE = "assets.pack"
+CACHE_DIR = "cache"
 
 # Timing
 TICKS_PER_SEC = 20
+# Longest time an idle display waits before checking in with the window system again
+IDLE_WAKE_SECS = .25
 
 # Colors
 WHITE = Color("white")
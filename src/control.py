@@ -1,17 +1,26 @@
+# First so the imports after it are timed when profiling startup
+from src import profiling
+
 import os.path as path
 from abc import ABC, abstractmethod
+from argparse import ArgumentParser, ArgumentTypeError
+from multiprocessing import freeze_support
+from queue import Queue
 from threading import Thread
 from tkinter import Tk, PhotoImage, LabelFrame, Label, Radiobutton, Button, Listbox, IntVar, StringVar, N, S, E, W, \
     DISABLED, NORMAL, \
     Entry, Frame, END, Spinbox, RIGHT
-from tkinter.messagebox import askquestion
+from tkinter.filedialog import asksaveasfilename
+from tkinter.messagebox import askquestion, showerror
 
 import pygame
 
 from src.audio import AudioManager
-from src.constants import GameState, ASSET_DIR
-from src.display import GraphicsManager, FastMoneyResponseCard
-from src.survey import Survey, Response
+from src.constants import GameState, ASSET_DIR, TICKS_PER_SEC
+from src.display import GraphicsManager, FastMoneyResponseCard, use_headless_drivers
+from src.library import SurveyLibrary, SURVEY_LIBRARY
+from src.renderprocess import RemoteDisplay
+from src.survey import Survey, Response, SurveyChanges
 
 
 class ControlApp:
@@ -26,24 +35,41 @@ class ControlApp:
 
     PREPARING_MAIN, PREPARING_FM = range(2)
 
-    def __init__(self, root):
+    # How often to check the render process is still running in milliseconds
+    RENDER_PROCESS_CHECK_MS = 1000
+
+    def __init__(self, root, idle_rendering=True, headless=False, resolution=None, frame_rate=TICKS_PER_SEC,
+                 prerender_animations=False, render_process=False):
         self.root = root
         # Main Window
+        if headless:
+            root.withdraw()
         root.geometry("800x800")
         root.title("The Feud Game Control")
-        root.iconphoto(True, PhotoImage(file=path.realpath(ASSET_DIR + r"images\icon.png")))
+        root.iconphoto(True, PhotoImage(file=path.realpath(path.join(ASSET_DIR, "images", "icon.png"))))
         root.configure(background=self.BG_COLOR)
         root.protocol("WM_DELETE_WINDOW", self.click_close)
 
         # Setup display
-        self.display_manager = GraphicsManager()
+        self.render_process = render_process
+        with profiling.phase("display setup"):
+            if render_process:
+                self.display_manager = RemoteDisplay(resolution, headless=headless, frame_rate=frame_rate,
+                                                     prerender_animations=prerender_animations,
+                                                     idle_rendering=idle_rendering)
+            else:
+                self.display_manager = GraphicsManager(resolution, headless=headless, frame_rate=frame_rate,
+                                                       prerender_animations=prerender_animations)
         self.graphics_thread = Thread(target=self.display_callback)
         self.quitting = False
+        # Stop presenting frames while the board is static
+        self.idle_rendering = idle_rendering
         self.display_manager.team_1_score.text = "0"
         self.display_manager.team_2_score.text = "0"
 
         # Setup audio
-        self.audio_manager = AudioManager()
+        with profiling.phase("audio setup"):
+            self.audio_manager = AudioManager()
 
         # Mode Selection (the game state)
         self.mode = GameState.PREPARING
@@ -246,21 +272,74 @@ class ControlApp:
 
         self.preparing_frame.grid(row=1, column=0)
 
-        self.graphics_thread.start()
+        # Diagnostics
+        diagnostics_frame = LabelFrame(root, text="Diagnostics", bg=self.BG_COLOR)
+        Label(diagnostics_frame, text="Stats Overlay:", bg=self.BG_COLOR).grid(row=0, column=0)
+        self.stats_overlay_var = IntVar(value=0)
+        self.stats_overlay_var.trace_add("write", self.update_stats_overlay)
+        Radiobutton(diagnostics_frame, text="Show", bg=self.BUTTON_COLOR, indicator=0, variable=self.stats_overlay_var,
+                    value=1, padx=10).grid(row=0, column=1, padx=2, pady=2)
+        Radiobutton(diagnostics_frame, text="Hide", bg=self.BUTTON_COLOR, indicator=0, variable=self.stats_overlay_var,
+                    value=0, padx=10).grid(row=0, column=2, padx=2, pady=2)
+        Button(diagnostics_frame, text="Save Stats CSV", bg=self.BUTTON_COLOR, command=self.save_stats_csv).grid(
+            row=0, column=3, padx=2, pady=2)
+        Label(diagnostics_frame, text="Resolution:", bg=self.BG_COLOR).grid(row=1, column=0)
+        self.resolution_var = StringVar(value="{}x{}".format(*resolution) if resolution else "")
+        Entry(diagnostics_frame, textvariable=self.resolution_var, width=10).grid(row=1, column=1, columnspan=2)
+        Button(diagnostics_frame, text="Change", bg=self.BUTTON_COLOR, command=self.change_resolution).grid(
+            row=1, column=3, padx=2, pady=2, sticky=W + E)
+        diagnostics_frame.grid(row=2, column=0, pady=4)
+
+        if render_process:
+            self.root.after(self.RENDER_PROCESS_CHECK_MS, self.check_render_process)
+        else:
+            self.graphics_thread.start()
 
     # General
     def display_callback(self):
         while not self.quitting:
-            pygame.event.pump()
-            self.display_manager.update(self.mode)
+            self.display_manager.run_frame(self.mode, self.idle_rendering)
+
+    def check_render_process(self):
+        self.display_manager.check_running()
+        self.root.after(self.RENDER_PROCESS_CHECK_MS, self.check_render_process)
+
+    def record_to(self, video_path):
+        """
+        Records the frames the display presents and the sounds played for the rest of the session
+
+        :param video_path: the path of the video file
+        """
+        self.display_manager.record_to(video_path)
+        self.audio_manager.sound_listeners.append(self.display_manager.record_sound)
 
     def click_close(self):
         ret = askquestion("Confirm Action", "Are you sure you want to close the game?")
         if ret == "yes":
             self.quitting = True
-            self.graphics_thread.join()
+            if not self.render_process:
+                self.display_manager.wake()
+                self.graphics_thread.join()
+            self.display_manager.close()
             self.root.destroy()
 
+    def update_stats_overlay(self, *_):
+        self.display_manager.set_stats_visible(bool(self.stats_overlay_var.get()))
+
+    def save_stats_csv(self):
+        filename = asksaveasfilename(title="Save Stats", defaultextension=".csv",
+                                     filetypes=[("CSV files", "*.csv")])
+        if filename and not self.display_manager.save_stats_csv(filename):
+            showerror("Error", "Could not save the stats")
+
+    def change_resolution(self):
+        try:
+            resolution = parse_resolution(self.resolution_var.get())
+        except ArgumentTypeError as error:
+            showerror("Error", str(error))
+            return
+        self.display_manager.change_resolution(resolution)
+
     # Mode Changes
     def select_mode(self, *_):
         current_state = self.mode
@@ -328,6 +407,10 @@ class ControlApp:
             self.display_manager.logo_split.open()
         # Last thing is set new state to current and update display ids to match new state
         self.mode = new_state
+        if self.render_process:
+            self.display_manager.set_state(new_state)
+        else:
+            self.display_manager.wake()
         self.update_display_ids()
 
     @staticmethod
@@ -834,6 +917,9 @@ class SurveyListWidget(Frame):
     A Listbox with all the survey names plus a button to reload the list
     """
 
+    # How often to check on surveys loading in the background
+    LOAD_CHECK_MS = 50
+
     def __init__(self, root, select_cb, **kwargs):
         super().__init__(root, bg=ControlApp.BG_COLOR, **kwargs)
         Label(self, text="Survey List", bg=ControlApp.BG_COLOR).grid(row=0, column=0, sticky=W)
@@ -844,7 +930,17 @@ class SurveyListWidget(Frame):
         self.select_cb = select_cb
         Button(self, text="Reload", command=self.reload, bg=ControlApp.BUTTON_COLOR).grid(row=2, column=0,
                                                                                           sticky=N + S + E + W)
+        self.changes_var = StringVar(self)
+        Label(self, textvariable=self.changes_var, bg=ControlApp.BG_COLOR).grid(row=3, column=0, sticky=W)
         self.selected = Survey.NONE
+        # The survey generation the list was last filled from
+        self.generation = None
+        # Progress and the changes once done from the thread loading the surveys
+        self.load_messages = None
+
+    @property
+    def loading(self):
+        return self.load_messages is not None
 
     def clicked(self, *_):
         # Need the 'or 0' for some reason
@@ -852,23 +948,137 @@ class SurveyListWidget(Frame):
         self.select_cb()
 
     def reload(self):
-        Survey.reload_all()
+        # Loaded on another thread so the window stays responsive, filling in the list as batches of surveys load
+        if self.loading:
+            return
+        self.load_messages = Queue()
+        self.changes_var.set("Loading surveys...")
+        Thread(target=self.load_surveys, args=(self.load_messages,), daemon=True).start()
+        self.after(self.LOAD_CHECK_MS, self.check_loading)
+
+    @staticmethod
+    def load_surveys(messages):
+        changes = None
+        try:
+            changes = Survey.reload_all(lambda count, total: messages.put((count, total)))
+        finally:
+            messages.put(changes)
+
+    def check_loading(self):
+        done = False
+        while not self.load_messages.empty():
+            message = self.load_messages.get()
+            if message is None:
+                self.changes_var.set("Could not load the surveys")
+                done = True
+            elif isinstance(message, SurveyChanges):
+                self.changes_var.set("{} new, {} changed, {} removed".format(*(len(names) for names in message)))
+                done = True
+            else:
+                self.changes_var.set("Loading surveys {}/{}".format(*message))
         self.update()
+        if done:
+            self.load_messages = None
+        else:
+            self.after(self.LOAD_CHECK_MS, self.check_loading)
 
     def update(self):
+        # Refilling the list is slow with thousands of surveys so only do it when they have changed
+        if self.generation == Survey.generation:
+            return
+        self.generation = Survey.generation
+        selection = self.listbox.curselection()
+        selected_name = self.listbox.get(selection[0]) if selection else None
+        names = list(Survey.get_surveys().keys())
         self.listbox.delete(0, END)
-        for name in Survey.get_surveys().keys():
-            self.listbox.insert(END, name)
-        self.listbox.select_set(0)
-        self.clicked()
+        self.listbox.insert(END, *names)
+        # Keep the selection as the list fills in while loading
+        index = names.index(selected_name) if selected_name in names else 0
+        self.listbox.select_set(index)
+        # Only select again if a different survey is selected now so the preview is not reset by every batch
+        if Survey.get_surveys().get(names[index] if names else None, Survey.NONE) is not self.selected:
+            self.clicked()
+
+
+def parse_resolution(text):
+    """
+    Parses a resolution argument of the form WIDTHxHEIGHT
+
+    :param text: the argument text
+
+    :return: tuple of the width and height
+    """
+    try:
+        width, height = (int(value) for value in text.lower().split("x"))
+    except ValueError:
+        raise ArgumentTypeError("Resolution should be of the form WIDTHxHEIGHT: {}".format(text))
+    if width <= 0 or height <= 0:
+        raise ArgumentTypeError("Resolution width and height should be more than 0: {}".format(text))
+    return width, height
 
 
 if __name__ == '__main__':
-    pygame.init()
+    # The recording process is started from the frozen executable too
+    freeze_support()
+    parser = ArgumentParser(description="Runs The Feud game")
+    parser.add_argument("--headless", action="store_true",
+                        help="render offscreen and hide the control window (Tk still needs a display server)")
+    parser.add_argument("--resolution", type=parse_resolution, help="display resolution as WIDTHxHEIGHT")
+    parser.add_argument("--fps", type=int, default=TICKS_PER_SEC,
+                        help="most frames to present per second (default {})".format(TICKS_PER_SEC))
+    parser.add_argument("--prerender-animations", action="store_true",
+                        help="pre-render card animations when their text is set (uses more memory)")
+    parser.add_argument("--save-frames", metavar="DIR", help="save every presented frame as a PNG in the directory")
+    parser.add_argument("--share-frames", metavar="FILE",
+                        help="publish every presented frame into a memory mapped frame ring file")
+    parser.add_argument("--record", metavar="FILE",
+                        help="record the display to a video file (encoded with ffmpeg when it is installed)")
+    parser.add_argument("--render-process", action="store_true",
+                        help="run the display in its own process (restarted if it stops)")
+    parser.add_argument("--library", metavar="FILE", nargs="?", const=SURVEY_LIBRARY,
+                        help="load surveys from a survey library ({} by default) instead of the folder".format(
+                            SURVEY_LIBRARY))
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.library:
+        if not path.exists(args.library):
+            parser.error("The survey library does not exist: {}".format(args.library))
+        try:
+            Survey.use_library(SurveyLibrary(args.library))
+        except ValueError as library_error:
+            parser.error(str(library_error))
+
+    if args.headless:
+        use_headless_drivers()
+    with profiling.phase("pygame.init"):
+        pygame.init()
 
     # Set up tkinter and start looping
-    master = Tk()
-    ControlApp(master)
+    with profiling.phase("Tk"):
+        master = Tk()
+    with profiling.phase("control app"):
+        app = ControlApp(master, headless=args.headless, resolution=args.resolution, frame_rate=args.fps,
+                         prerender_animations=args.prerender_animations, render_process=args.render_process)
+    if args.save_frames:
+        app.display_manager.save_frames_to(args.save_frames)
+    if args.share_frames:
+        app.display_manager.share_frames_to(args.share_frames)
+    if args.record:
+        app.record_to(args.record)
+    if args.profile_startup:
+        def finish_profile():
+            # Wait for the first frame, images, sounds and surveys, which happen on other threads (the display of a
+            # render process is not profiled)
+            display_ready = args.render_process or (app.display_manager.frame_number and
+                                                    app.display_manager.assets_loaded())
+            surveys_loaded = not app.main_survey_list_widget.loading and not app.fm_survey_list_widget.loading
+            if not display_ready or not app.audio_manager.loaded or not surveys_loaded:
+                master.after(10, finish_profile)
+                return
+            profiling.mark("control window idle")
+            profiling.finish(args.profile_json)
+        master.after_idle(finish_profile)
     master.mainloop()
 
     pygame.quit()
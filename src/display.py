@@ -1,14 +1,47 @@
 import os
+from math import ceil
 from abc import ABC, abstractmethod
-from threading import Lock
+from collections import OrderedDict, deque
+from io import BytesIO
+from threading import Lock, Event, Thread
+from time import perf_counter
 
 import pygame
 from pygame.math import Vector2
 
-from src.constants import GameState, TICKS_PER_SEC, TEXT_COLOR, WHITE, MAGENTA, ASSET_DIR
+from src import animation, effects, profiling
+from src.assets import ScaledImageCache
+from src.bundle import Assets
+from src.constants import GameState, TICKS_PER_SEC, TEXT_COLOR, WHITE, MAGENTA, ASSET_DIR, ASSET_BUNDLE, CACHE_DIR, \
+    IDLE_WAKE_SECS
+from src.frameshare import FrameRing
+from src.recording import SessionRecorder
+from src.stats import RenderStats
 
 
-class TextLabel(pygame.sprite.Sprite):
+class DisplaySprite(pygame.sprite.DirtySprite):
+    """
+    A sprite that flags itself for redrawing whenever its image changes.
+    Methods that change what a sprite shows only update its state on the calling thread - the drawing they need is
+    posted to the display thread, which is the only thread that draws a sprite once the display is running.
+    """
+
+    def mark_dirty(self):
+        """
+        Marks the sprite as needing to be redrawn on the next frame
+        """
+        self.dirty = 1
+        GraphicsManager.instance.wake()
+
+    @property
+    def displayed(self):
+        """
+        :return: whether the sprite has been set up for the display (its images may still be loading)
+        """
+        return self.rect is not None
+
+
+class TextLabel(DisplaySprite):
     """
     Text that appears on the screen
     """
@@ -35,17 +68,26 @@ class TextLabel(pygame.sprite.Sprite):
     @text.setter
     def text(self, value):
         self._text = str(value)
-        self.render()
+        GraphicsManager.instance.post(self.render)
+
+    def restore(self, state):
+        """
+        Shows the state saved from another display (such as one that was restarted)
+
+        :param state: dict of the text
+        """
+        self.text = state["text"]
 
     def render(self):
-        with GraphicsManager.instance.lock:
-            self.image.fill(MAGENTA)
-            font = self.font_helper.fits_default(self._text, self.font_guess, self.rect)
-            text_image = font.render(self._text, False, TEXT_COLOR)
-            text_rect = text_image.get_rect()
-            text_rect.x = self.rect.width / 2 - text_rect.centerx
-            text_rect.y = self.rect.height / 2 - text_rect.centery
-            self.image.blit(text_image, text_rect)
+        if not self.displayed:
+            return
+        self.image.fill(MAGENTA)
+        text_image = self.font_helper.render_fits_default(self._text, self.font_guess, self.rect, TEXT_COLOR)
+        text_rect = text_image.get_rect()
+        text_rect.x = self.rect.width / 2 - text_rect.centerx
+        text_rect.y = self.rect.height / 2 - text_rect.centery
+        self.image.blit(text_image, text_rect)
+        self.mark_dirty()
 
 
 class IDLabel(TextLabel):
@@ -54,46 +96,103 @@ class IDLabel(TextLabel):
     """
 
     def render(self):
-        with GraphicsManager.instance.lock:
-            self.image.fill(MAGENTA)
-            font = self.font_helper.fits_default(self._text, self.font_guess, self.rect)
-            text_image = font.render(self._text, False, TEXT_COLOR)
-            text_rect = text_image.get_rect()
-            text_rect.x = self.rect.width - text_rect.width
-            text_rect.y = self.rect.height - text_rect.height
-            self.image.blit(text_image, text_rect)
+        if not self.displayed:
+            return
+        self.image.fill(MAGENTA)
+        text_image = self.font_helper.render_fits_default(self._text, self.font_guess, self.rect, TEXT_COLOR)
+        text_rect = text_image.get_rect()
+        text_rect.x = self.rect.width - text_rect.width
+        text_rect.y = self.rect.height - text_rect.height
+        self.image.blit(text_image, text_rect)
+        self.mark_dirty()
 
 
-class AnimatedSprite(pygame.sprite.Sprite, ABC):
+class AnimatedSprite(DisplaySprite, ABC):
     """
-    An animated sprite
+    An animated sprite.
+    Animations are timed by the animation clock rather than by counting frames, so they take the same time and look
+    the same at any frame rate.
     """
 
     def __init__(self):
         super().__init__()
-        self.animation_counter = 0
+        self.animation_start = 0
+        self.animation_time = 0
         self.current_animation = None
 
     def is_anim_active(self):
         return self.current_animation is not None
 
     def start_animation(self, anim_id=0):
-        self.animation_counter = 0
+        self.animation_start = animation.now()
+        self.animation_time = 0
         self.current_animation = anim_id
+        GraphicsManager.instance.wake()
 
     def update(self):
         if self.is_anim_active():
-            self.animation_counter += 1
+            self.animation_time = animation.now() - self.animation_start
             self.tick()
 
+    def animation_progress(self, duration, easing=animation.linear, delay=0):
+        """
+        Gets how far through the current animation (or a part of it) the sprite is
+
+        :param duration: how long the animation (or part) takes in seconds
+        :param easing: the easing curve to apply
+        :param delay: how long into the animation the part starts in seconds
+
+        :return: the eased progress from 0 to 1
+        """
+        return easing(min(1.0, max(0.0, (self.animation_time - delay) / duration)))
+
+    def bake_strip(self, frame_keys, draw_frame):
+        """
+        Pre-renders the frames of an animation so playing it back is a single blit per frame.
+        Nothing is baked when pre-rendering is off or the frames do not fit in the frame strip budget.
+
+        :param frame_keys: the values to render a frame for
+        :param draw_frame: function drawing a frame onto the given surface for the given key
+
+        :return: list of the frame surfaces in the order of the keys or None when the animation is rendered live
+        """
+        strips = GraphicsManager.instance.frame_strips
+        if strips is None:
+            return None
+        if not strips.reserve(self, TextSurfaceCache.surface_bytes(self.image) * len(frame_keys)):
+            return None
+        frames = list()
+        for key in frame_keys:
+            frame = self.image.copy()
+            # Frames replace the whole image when blitted, transparent pixels included
+            frame.set_colorkey(None)
+            draw_frame(frame, key)
+            frames.append(frame)
+        return frames
+
+    @staticmethod
+    def strip_frame(strip, progress):
+        """
+        :return: the frame of a strip baked at evenly spaced progress values nearest the given (linear) progress
+        """
+        return strip[round(progress * (len(strip) - 1))]
+
     @abstractmethod
     def tick(self):
         pass
 
     def end_animation(self):
-        self.animation_counter = 0
+        self.animation_time = 0
         self.current_animation = None
 
+    def end_animation_and_render(self):
+        self.end_animation()
+        self.render()
+
+    @abstractmethod
+    def render(self):
+        pass
+
 
 class LogoSplit(AnimatedSprite):
     """
@@ -101,6 +200,9 @@ class LogoSplit(AnimatedSprite):
     """
     _ANIM_OPENING, _ANIM_CLOSING = range(2)
 
+    SPLIT_TIME = 2
+    SPLIT_EASING = staticmethod(animation.linear)
+
     def __init__(self):
         super().__init__()
         self.closed = True
@@ -111,7 +213,6 @@ class LogoSplit(AnimatedSprite):
         self.rect = pygame.Rect(0, 0, 0, 0)
         self.left_x = 0
         self.right_x = 0
-        self.dx = 0
         self.image = None
         self.blank_image = None
 
@@ -122,7 +223,6 @@ class LogoSplit(AnimatedSprite):
         self.full_image = pygame.Surface(size)
         self.full_image.blit(left_image, (0, 0))
         self.full_image.blit(right_image, (size[0] / 2, 0))
-        self.dx = left_image.get_width() / (2 * TICKS_PER_SEC)
         self.left_x = 0
         self.right_x = size[0] / 2
         self.image = pygame.Surface(size)
@@ -130,21 +230,37 @@ class LogoSplit(AnimatedSprite):
         self.render()
 
     def open(self):
+        self.closed = False
+        GraphicsManager.instance.post(self._start_opening)
+
+    def close(self):
+        self.closed = True
+        GraphicsManager.instance.post(self._start_closing)
+
+    def _start_opening(self):
         self.left_x = 0
         self.right_x = self.left_image.get_width()
-        self.closed = False
         self.start_animation(self._ANIM_OPENING)
 
-    def close(self):
+    def _start_closing(self):
         self.left_x = -self.left_image.get_width()
         self.right_x = self.rect.width
-        self.closed = True
+        # Keep showing the last frame behind the closing logo even though the state may have changed
         self.background_image = GraphicsManager.instance.screen.copy()
         self.start_animation(self._ANIM_CLOSING)
 
     def stop_split(self):
         self.end_animation()
 
+    def restore(self, state):
+        """
+        Shows the state saved from another display (such as one that was restarted) without animating
+
+        :param state: dict of whether the logo is closed
+        """
+        self.closed = state["closed"]
+        GraphicsManager.instance.post(self.end_animation_and_render)
+
     def render(self):
         if not self.is_anim_active():
             if self.closed:
@@ -152,19 +268,22 @@ class LogoSplit(AnimatedSprite):
             else:
                 self.image.fill(MAGENTA)
         else:
+            half_width = self.left_image.get_width()
+            progress = self.animation_progress(self.SPLIT_TIME, self.SPLIT_EASING)
             if self.current_animation == self._ANIM_CLOSING:
                 self.image.blit(self.background_image, (0, 0))
-                self.left_x += self.dx
-                self.right_x -= self.dx
+                self.left_x = animation.lerp(-half_width, 0, progress)
+                self.right_x = animation.lerp(self.rect.width, half_width, progress)
             else:
                 self.image.fill(MAGENTA)
-                self.left_x -= self.dx
-                self.right_x += self.dx
+                self.left_x = animation.lerp(0, -half_width, progress)
+                self.right_x = animation.lerp(half_width, self.rect.width, progress)
             self.image.blit(self.left_image, (self.left_x, 0))
             self.image.blit(self.right_image, (self.right_x, 0))
+        self.mark_dirty()
 
     def tick(self):
-        if self.animation_counter >= (2 * TICKS_PER_SEC) + 1:
+        if self.animation_time >= self.SPLIT_TIME:
             self.stop_split()
         self.render()
 
@@ -188,7 +307,7 @@ class ResponseCard(AnimatedSprite, ABC):
     @phrase.setter
     def phrase(self, phrase):
         self._phrase = phrase
-        self.update_images()
+        GraphicsManager.instance.post(self.update_images)
 
     @property
     def count(self):
@@ -197,7 +316,7 @@ class ResponseCard(AnimatedSprite, ABC):
     @count.setter
     def count(self, count):
         self._count = count
-        self.update_images()
+        GraphicsManager.instance.post(self.update_images)
 
     @abstractmethod
     def update_images(self):
@@ -219,12 +338,19 @@ class MainResponseCard(ResponseCard):
     The response card style for the main game
     """
 
+    REVEAL_TIME = .2
+    REVEAL_EASING = staticmethod(animation.linear)
+    # The revealed card glows once after sliding open
+    GLOW_TIME = .6
+    GLOW_BRIGHTNESS = .35
+
     def __init__(self, font_helper):
         super().__init__()
         self._visible = False
         self.hidden_image = None
         self.revealed_image = None
         self.revealed_bg_image = None
+        self.reveal_strip = None
         self.text_rect = None
         self.num_rect = None
         self.font_helper = font_helper
@@ -243,14 +369,25 @@ class MainResponseCard(ResponseCard):
 
     def reveal(self):
         self._visible = True
-        self.start_animation(0)
+        GraphicsManager.instance.post(self.start_animation, 0)
 
     def hide(self):
         self._visible = False
-        self.render()
+        GraphicsManager.instance.post(self.render)
+
+    def restore(self, state):
+        """
+        Shows the state saved from another display (such as one that was restarted) without animating
+
+        :param state: dict of the phrase, count and whether the card is revealed
+        """
+        self._phrase = state["phrase"]
+        self._count = state["count"]
+        self._visible = state["visible"]
+        GraphicsManager.instance.post(self.update_images)
 
     def tick(self):
-        if self.animation_counter >= 1 * TICKS_PER_SEC:
+        if self.animation_time >= self.REVEAL_TIME + self.GLOW_TIME:
             self.end_animation()
         self.render()
 
@@ -268,34 +405,53 @@ class MainResponseCard(ResponseCard):
 
     def update_images(self):
         self.end_animation()
-        with GraphicsManager.instance.lock:
-            self.image.fill(MAGENTA)
-            if not self.valid:
-                return
-            self.revealed_image = self.revealed_bg_image.copy()
-            font = self.font_helper.fits_default(self.phrase, self.font_guess, self.text_rect)
-            text_image = font.render(self.phrase, False, TEXT_COLOR)
-            rendered_rect = text_image.get_rect()
-            rendered_rect.x = self.text_rect.centerx - rendered_rect.centerx
-            rendered_rect.y = self.text_rect.centery - rendered_rect.centery
-            self.revealed_image.blit(text_image, rendered_rect)
-            font = self.font_helper.fits_default(str(self.count), self.font_guess, self.num_rect)
-            num_image = font.render(str(self.count), False, TEXT_COLOR)
-            rendered_rect = num_image.get_rect()
-            rendered_rect.x = self.num_rect.centerx - rendered_rect.centerx
-            rendered_rect.y = self.num_rect.centery - rendered_rect.centery
-            self.revealed_image.blit(num_image, rendered_rect)
+        if not self.displayed:
+            return
+        self.image.fill(MAGENTA)
+        if not self.valid:
+            GraphicsManager.instance.release_strips(self)
+            self.reveal_strip = None
+            self.mark_dirty()
+            return
+        self.revealed_image = self.revealed_bg_image.copy()
+        text_image = self.font_helper.render_fits_default(self.phrase, self.font_guess, self.text_rect, TEXT_COLOR)
+        rendered_rect = text_image.get_rect()
+        rendered_rect.x = self.text_rect.centerx - rendered_rect.centerx
+        rendered_rect.y = self.text_rect.centery - rendered_rect.centery
+        self.revealed_image.blit(text_image, rendered_rect)
+        num_image = self.font_helper.render_fits_default(str(self.count), self.font_guess, self.num_rect, TEXT_COLOR)
+        rendered_rect = num_image.get_rect()
+        rendered_rect.x = self.num_rect.centerx - rendered_rect.centerx
+        rendered_rect.y = self.num_rect.centery - rendered_rect.centery
+        self.revealed_image.blit(num_image, rendered_rect)
+        self.reveal_strip = self.bake_strip(GraphicsManager.instance.strip_progress(self.REVEAL_TIME),
+                                            self._draw_reveal)
         self.render()
 
+    def _draw_reveal(self, surface, progress):
+        surface.blit(self.revealed_image, (0, 0))
+        hidden_y = int(self.rect.height * self.REVEAL_EASING(progress))
+        surface.blit(self.hidden_image, (0, hidden_y))
+
     def render(self):
+        if not self.displayed:
+            return
         if not self._visible:
             self.image.blit(self.hidden_image, (0, 0))
         elif not self.is_anim_active():
             self.image.blit(self.revealed_image, (0, 0))
-        elif self.valid:
-            self.image.blit(self.revealed_image, (0, 0))
-            hidden_y = int(self.rect.height * (self.animation_counter / (.2 * TICKS_PER_SEC)))
-            self.image.blit(self.hidden_image, (0, hidden_y))
+        elif not self.valid:
+            pass
+        elif self.animation_time >= self.REVEAL_TIME:
+            glow = self.animation_progress(self.GLOW_TIME, effects.pulse, self.REVEAL_TIME)
+            effects.brighten(self.image, self.revealed_image, self.GLOW_BRIGHTNESS * glow)
+        else:
+            progress = self.animation_progress(self.REVEAL_TIME)
+            if self.reveal_strip:
+                self.image.blit(self.strip_frame(self.reveal_strip, progress), (0, 0))
+            else:
+                self._draw_reveal(self.image, progress)
+        self.mark_dirty()
 
 
 class FastMoneyResponseCard(ResponseCard):
@@ -305,9 +461,9 @@ class FastMoneyResponseCard(ResponseCard):
 
     UNREVEALED, PHRASE_REVEALED, COUNT_REVEALED = range(3)
 
-    PHRASE_REVEAL_TIME = int(.5 * TICKS_PER_SEC)
-    HALF_FLASH_TIME = int(.5 * TICKS_PER_SEC)
-    TOTAL_TIME = PHRASE_REVEAL_TIME + 2 * HALF_FLASH_TIME
+    PHRASE_REVEAL_TIME = .5
+    PHRASE_REVEAL_EASING = staticmethod(animation.linear)
+    HALF_FLASH_TIME = .5
 
     def __init__(self, font_helper):
         super().__init__()
@@ -318,6 +474,8 @@ class FastMoneyResponseCard(ResponseCard):
         self.red_block_image = None
         self.red_block_width = 0
         self.revealed_image = None
+        # The phrase reveal frames followed by the flashing frame with the red box over the count
+        self.reveal_strip = None
         self.font_helper = font_helper
         self.font_guess = 72
 
@@ -334,59 +492,94 @@ class FastMoneyResponseCard(ResponseCard):
 
     def reveal_phrase(self):
         self.reveal_stage = self.PHRASE_REVEALED
-        self.start_animation()
+        GraphicsManager.instance.post(self.start_animation)
 
     def reveal_value(self):
         self.reveal_stage = self.COUNT_REVEALED
-        self.end_animation()
-        self.render()
+        GraphicsManager.instance.post(self.end_animation_and_render)
 
     def hide(self):
         self.reveal_stage = self.UNREVEALED
-        self.render()
+        # The phrase flashing animation never ends by itself
+        GraphicsManager.instance.post(self.end_animation_and_render)
+
+    def restore(self, state):
+        """
+        Shows the state saved from another display (such as one that was restarted)
+
+        :param state: dict of the phrase, count and reveal stage
+        """
+        self._phrase = state["phrase"]
+        self._count = state["count"]
+        self.reveal_stage = state["reveal_stage"]
+        GraphicsManager.instance.post(self.update_images)
+        if self.reveal_stage == self.PHRASE_REVEALED:
+            # Flashing only happens while animating
+            GraphicsManager.instance.post(self.start_animation)
 
     def update_images(self):
         self.end_animation()
-        with GraphicsManager.instance.lock:
-            self.revealed_image = pygame.Surface(self.rect.size).convert()
-            self.revealed_image.fill(MAGENTA)
-            font = self.font_helper.fits_default(self.phrase, self.font_guess, self.text_rect)
-            text_image = font.render(self.phrase, False, TEXT_COLOR)
-            rendered_rect = text_image.get_rect()
-            rendered_rect.x = self.text_rect.x + 5
-            rendered_rect.y = self.text_rect.centery - rendered_rect.centery
-            self.revealed_image.blit(text_image, rendered_rect)
-            font = self.font_helper.fits_default(str(self.count), self.font_guess, self.num_rect)
-            num_image = font.render(str(self.count), False, TEXT_COLOR)
-            rendered_rect = num_image.get_rect()
-            rendered_rect.x = self.num_rect.centerx - rendered_rect.centerx
-            rendered_rect.y = self.num_rect.centery - rendered_rect.centery
-            self.revealed_image.blit(num_image, rendered_rect)
+        if not self.displayed:
+            return
+        self.revealed_image = pygame.Surface(self.rect.size).convert()
+        self.revealed_image.fill(MAGENTA)
+        text_image = self.font_helper.render_fits_default(self.phrase, self.font_guess, self.text_rect, TEXT_COLOR)
+        rendered_rect = text_image.get_rect()
+        rendered_rect.x = self.text_rect.x + 5
+        rendered_rect.y = self.text_rect.centery - rendered_rect.centery
+        self.revealed_image.blit(text_image, rendered_rect)
+        num_image = self.font_helper.render_fits_default(str(self.count), self.font_guess, self.num_rect, TEXT_COLOR)
+        rendered_rect = num_image.get_rect()
+        rendered_rect.x = self.num_rect.centerx - rendered_rect.centerx
+        rendered_rect.y = self.num_rect.centery - rendered_rect.centery
+        self.revealed_image.blit(num_image, rendered_rect)
+        frame_keys = [(progress, False) for progress in GraphicsManager.instance.strip_progress(
+            self.PHRASE_REVEAL_TIME)]
+        frame_keys.append((1.0, True))
+        self.reveal_strip = self.bake_strip(frame_keys, self._draw_phrase)
         self.render()
 
     def tick(self):
-        if self.animation_counter >= self.TOTAL_TIME:
-            self.animation_counter = self.PHRASE_REVEAL_TIME
         self.render()
 
+    def flash_shown(self):
+        """
+        :return: whether the flashing red box over the count is currently shown
+        """
+        flash_time = (self.animation_time - self.PHRASE_REVEAL_TIME) % (2 * self.HALF_FLASH_TIME)
+        return flash_time < self.HALF_FLASH_TIME
+
     def render(self):
+        if not self.displayed:
+            return
         if self.reveal_stage == self.UNREVEALED:
             self.image.fill(MAGENTA)
         elif self.reveal_stage == self.COUNT_REVEALED:
             self.image.blit(self.revealed_image, (0, 0))
         elif self.reveal_stage == self.PHRASE_REVEALED:
-            self.image.fill(MAGENTA)
-            temp_width = (self.text_rect.width - self.red_block_width) * min(1.0, self.animation_counter / (
-                self.PHRASE_REVEAL_TIME))
-            temp_rect = pygame.Rect(0, 0, temp_width, self.rect.height)
-            self.image.blit(self.revealed_image, (0, 0), temp_rect)
-            if self.animation_counter < self.PHRASE_REVEAL_TIME:
-                # revealing phrase
-                temp_rect.x = temp_rect.width
-                self.image.blit(self.red_block_image, temp_rect)
-            elif self.animation_counter < (self.PHRASE_REVEAL_TIME + self.HALF_FLASH_TIME):
-                # flashing red box over count
-                self.image.blit(self.red_block_image, self.num_rect.topleft)
+            progress = self.animation_progress(self.PHRASE_REVEAL_TIME)
+            box_shown = progress >= 1.0 and self.flash_shown()
+            if not self.reveal_strip:
+                self._draw_phrase(self.image, (progress, box_shown))
+            elif box_shown:
+                self.image.blit(self.reveal_strip[-1], (0, 0))
+            else:
+                self.image.blit(self.strip_frame(self.reveal_strip[:-1], progress), (0, 0))
+        self.mark_dirty()
+
+    def _draw_phrase(self, surface, frame):
+        progress, box_shown = frame
+        surface.fill(MAGENTA)
+        temp_width = (self.text_rect.width - self.red_block_width) * self.PHRASE_REVEAL_EASING(progress)
+        temp_rect = pygame.Rect(0, 0, temp_width, self.rect.height)
+        surface.blit(self.revealed_image, (0, 0), temp_rect)
+        if progress < 1.0:
+            # revealing phrase
+            temp_rect.x = temp_rect.width
+            surface.blit(self.red_block_image, temp_rect)
+        elif box_shown:
+            # flashing red box over count
+            surface.blit(self.red_block_image, self.num_rect.topleft)
 
 
 class StrikeDisplay(AnimatedSprite):
@@ -394,15 +587,23 @@ class StrikeDisplay(AnimatedSprite):
     Displays the strikes on the screen
     """
 
+    SHOW_TIME = 2
+    # The strikes flash white when they appear
+    FLASH_TIME = .3
+    FLASH_BRIGHTNESS = .8
+
     def __init__(self):
         super().__init__()
         self.rect = None
         self.image = None
         self.strike_images = list()
+        self.flash_image = None
 
     def set_display(self, rect, strike_image):
         self.strike_images.clear()
         self.rect = rect
+        self.flash_image = pygame.Surface(rect.size).convert()
+        self.flash_image.set_colorkey(MAGENTA)
         strike_rect = strike_image.get_rect()
         loc = Vector2()
         loc.y = (rect.height / 2) - strike_rect.centery
@@ -441,16 +642,30 @@ class StrikeDisplay(AnimatedSprite):
         self.render()
 
     def show_strikes(self, num_strikes):
+        GraphicsManager.instance.post(self._start_strikes, num_strikes)
+
+    def _start_strikes(self, num_strikes):
         self.start_animation(num_strikes)
         self.render()
 
     def tick(self):
-        if self.animation_counter >= 2 * TICKS_PER_SEC:
+        if self.animation_time >= self.SHOW_TIME:
             self.end_animation()
         self.render()
 
     def render(self):
-        self.image = self.strike_images[self.current_animation or 0]
+        if not self.displayed:
+            return
+        image = self.strike_images[self.current_animation or 0]
+        if self.is_anim_active() and self.animation_time < self.FLASH_TIME:
+            flash = 1 - self.animation_progress(self.FLASH_TIME)
+            effects.brighten(self.flash_image, image, self.FLASH_BRIGHTNESS * flash)
+            self.image = self.flash_image
+            self.mark_dirty()
+        # Only a change of strike count needs to be redrawn
+        elif image is not self.image:
+            self.image = image
+            self.mark_dirty()
 
 
 class TimerLabel(TextLabel):
@@ -472,33 +687,149 @@ class TimerLabel(TextLabel):
         self.text = str(seconds)
 
 
+class TextSurfaceCache:
+    """
+    A least recently used cache of rendered text surfaces limited by the memory they use
+    """
+
+    def __init__(self, budget):
+        """
+        Creates an empty cache
+
+        :param budget: the most bytes of surface pixel data to keep cached
+        """
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def surface_bytes(surface):
+        return surface.get_pitch() * surface.get_height()
+
+    def get(self, font, text, size, color):
+        """
+        Get the rendered text, rendering it only if it is not already cached.
+        The returned surface is shared so it must not be modified.
+
+        :param font: the font object to render with
+        :param text: the text to render
+        :param size: the size of the font (part of the cache key)
+        :param color: the color of the text
+
+        :return: the surface with the rendered text
+        """
+        key = (text, size, tuple(color))
+        with self._lock:
+            surface = self._surfaces.get(key)
+            if surface is not None:
+                self._surfaces.move_to_end(key)
+                self.hits += 1
+                return surface
+            self.misses += 1
+        surface = font.render(text, False, color)
+        surface_bytes = self.surface_bytes(surface)
+        if surface_bytes > self.budget:
+            return surface
+        with self._lock:
+            if key not in self._surfaces:
+                self._surfaces[key] = surface
+                self.size += surface_bytes
+            while self.size > self.budget:
+                _, evicted = self._surfaces.popitem(last=False)
+                self.size -= self.surface_bytes(evicted)
+        return surface
+
+    def clear(self):
+        """
+        Removes all the cached surfaces
+        """
+        with self._lock:
+            self._surfaces.clear()
+            self.size = 0
+
+
+class FrameStripBudget:
+    """
+    Keeps the memory used by pre-rendered animation frame strips under a limit
+    """
+
+    def __init__(self, budget):
+        """
+        :param budget: the most bytes of frame pixel data to keep
+        """
+        self.budget = budget
+        self.size = 0
+        self._owners = dict()
+        self._lock = Lock()
+
+    def reserve(self, owner, strip_bytes):
+        """
+        Reserves memory for the frames of a sprite - replacing any frames it already has
+
+        :param owner: the sprite the frames are for
+        :param strip_bytes: the bytes of pixel data the frames use
+
+        :return: whether the frames fit in the budget (nothing is reserved if not)
+        """
+        with self._lock:
+            self.size -= self._owners.pop(owner, 0)
+            if self.size + strip_bytes > self.budget:
+                return False
+            self._owners[owner] = strip_bytes
+            self.size += strip_bytes
+            return True
+
+    def release(self, owner):
+        """
+        Frees the memory reserved for the frames of a sprite
+        """
+        with self._lock:
+            self.size -= self._owners.pop(owner, 0)
+
+
 class FontHelper:
     """
     A font that can have multiple sizes
     """
 
-    def __init__(self, path):
+    # Number of fitted text sizes remembered before the memo is reset
+    FIT_MEMO_LIMIT = 4096
+    # Bytes of rendered text kept around for reuse
+    TEXT_CACHE_BUDGET = 32 * 1024 * 1024
+
+    def __init__(self, path, data=None):
         """
         Create a font helper with the font from the given path.
         Invalid paths will raise OSError.
 
         :param path: the path to the font
+        :param data: the contents of the font file to use instead of reading the path (such as from the asset bundle)
         """
-        if not os.path.exists(path):
+        if data is None and not os.path.exists(path):
             raise OSError("The given font path is not valid: {}".format(path))
         self.path = path
+        self.data = data
         self._font_objects = {}
+        self._heights = {}
+        self._fit_memo = {}
+        self.text_cache = TextSurfaceCache(self.TEXT_CACHE_BUDGET)
 
     def clear_cache(self):
         """
         Clears the internal font cache
         """
         self._font_objects.clear()
+        self._heights.clear()
+        self._fit_memo.clear()
+        self.text_cache.clear()
 
     def get(self, size):
         """
         Get a font object of the given size.
-        Caches font objects to reduce memory usage.
+        Caches font objects so the font file is only opened once per size.
 
         :param size: the size to get of the font
 
@@ -509,7 +840,56 @@ class FontHelper:
         return self._font_objects[size]
 
     def _get_no_cache(self, size):
-        return pygame.font.Font(self.path, size)
+        with profiling.phase("font construction"):
+            if self.data is not None:
+                # Each font object keeps reading its own file
+                return pygame.font.Font(BytesIO(self.data), size)
+            return pygame.font.Font(self.path, size)
+
+    def height(self, size):
+        """
+        Get the height of text rendered at the given size.
+        Each size is only measured once.
+
+        :param size: the size of the font
+
+        :return: the height of a line of text in pixels
+        """
+        if size not in self._heights:
+            self._heights[size] = self.get(size).size("AEIOU")[1]
+        return self._heights[size]
+
+    def _text_fits(self, text, size, rect_size):
+        if self.height(size) > rect_size[1]:
+            return False
+        return self.get(size).size(text)[0] <= rect_size[0]
+
+    def fit_size(self, text, max_font_size, rect_size):
+        """
+        Get the largest font size at or below given max size that fits the given text in the given rectangular size.
+
+        :param text: the text to fit
+        :param max_font_size: the maximum font size
+        :param rect_size: the size to fit the text in (can be Rect or list/tuple)
+
+        :return: the largest possible font size for the text size or else 0
+        """
+        if isinstance(rect_size, pygame.Rect):
+            rect_size = rect_size.size
+        key = (text, max_font_size, tuple(rect_size))
+        if key not in self._fit_memo:
+            if len(self._fit_memo) >= self.FIT_MEMO_LIMIT:
+                self._fit_memo.clear()
+            # Binary search on the largest fitting size since text only grows with the font size
+            low, high = 0, max_font_size
+            while low < high:
+                mid = (low + high + 1) // 2
+                if self._text_fits(text, mid, rect_size):
+                    low = mid
+                else:
+                    high = mid - 1
+            self._fit_memo[key] = low
+        return self._fit_memo[key]
 
     def fits(self, text, max_font_size, rect_size):
         """
@@ -522,17 +902,10 @@ class FontHelper:
 
         :return: the largest possible font object for the text size or else None
         """
-        if isinstance(rect_size, pygame.Rect):
-            rect_size = rect_size.size
-        for i in range(max_font_size, 1, -5):
-            font_size = max(1, i)
-            text_size = self._get_no_cache(font_size).size(text)
-            if rect_size[1] < text_size[1]:
-                continue
-            if rect_size[0] < text_size[0]:
-                continue
-            return self.get(font_size)
-        return None
+        font_size = self.fit_size(text, max_font_size, rect_size)
+        if not font_size:
+            return None
+        return self.get(font_size)
 
     def fits_default(self, text, max_font_size, rect_size, default_size=1):
         """
@@ -547,6 +920,22 @@ class FontHelper:
         """
         return self.fits(text, max_font_size, rect_size) or self.get(default_size)
 
+    def render_fits_default(self, text, max_font_size, rect_size, color, default_size=1):
+        """
+        Renders the text at the size fits_default() would use.
+        The rendered surface comes from the shared text cache so it must not be modified.
+
+        :param text: see fit()
+        :param max_font_size: see fit()
+        :param rect_size: see fit()
+        :param color: the color of the text
+        :param default_size: the size to default to if nothing fits
+
+        :return: the surface with the rendered text
+        """
+        font_size = self.fit_size(text, max_font_size, rect_size) or default_size
+        return self.text_cache.get(self.get(font_size), text, font_size, color)
+
     def fits_height(self, height, guess):
         """
         Determines the largest size of the font to fit in the given height
@@ -557,33 +946,27 @@ class FontHelper:
 
         :return: a font size that will fit within the given height or 1 if too small
         """
-        # True means last was oversized, False means last was undersized - init arbitrary
-        last_sized = True
-        # First iteration tracker
-        first = True
-        while True:
-            current_height = self._get_no_cache(guess).size("AEIOU")[1]
-            # current_height = self._get_no_cache(guess).get_height()
-            if current_height == height:
-                return guess
-            if current_height > height:
-                guess -= 5
-                if first:
-                    last_sized = True
-                    first = False
-                    if guess < 1:
-                        return 1
-                else:
-                    if not last_sized:
-                        return guess
+        if self.height(1) > height:
+            return 1
+        # The low size always fits and the high size never does
+        low, high = 1, max(2, guess)
+        while self.height(high) <= height:
+            low, high = high, high * 2
+        while high - low > 1:
+            mid = (low + high) // 2
+            if self.height(mid) <= height:
+                low = mid
             else:
-                guess += 5
-                if first:
-                    last_sized = False
-                    first = False
-                else:
-                    if last_sized:
-                        return guess
+                high = mid
+        return low
+
+
+def use_headless_drivers():
+    """
+    Makes SDL render and play audio without any devices - should be called before pygame is initialized
+    """
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
 
 
 class GraphicsManager:
@@ -591,6 +974,8 @@ class GraphicsManager:
 
     RAW_RESOLUTION = Vector2(1920, 1080)
 
+    FONT = "MuktaMahee-Regular.ttf"
+
     ID_RECT = pygame.Rect(1620, 1008, 300, 72)
 
     TEAM_1_SCORE_RECT = pygame.Rect(128, 449, 274, 186)
@@ -612,17 +997,63 @@ class GraphicsManager:
     FM_TOTAL_TEXT = pygame.Rect(1341, 876, 269, 112)
     FM_TOTAL_NUMBER = pygame.Rect(1637, 876, 112, 112)
 
-    def __init__(self, resolution=None):
+    # Most memory used by pre-rendered animation frames
+    FRAME_STRIP_BUDGET = 64 * 1024 * 1024
+
+    def __init__(self, resolution=None, dirty_rendering=True, headless=False, frame_rate=TICKS_PER_SEC,
+                 prerender_animations=False):
         """
         Creates the all the graphical elements
 
         :param resolution: the screen resolution (a Vector2 with width and height or an array)
+        :param dirty_rendering: whether to only redraw and present the regions of the screen that changed
+        :param headless: whether to render offscreen without a window (defaults to the raw resolution)
+        :param frame_rate: the most frames to present per second (animations take the same time at any rate)
+        :param prerender_animations: whether to pre-render card animations into frame strips when their text is set
         """
         GraphicsManager.instance = self
-        self.lock = Lock()
-        self.font_helper = FontHelper(ASSET_DIR + r"\MuktaMahee-Regular.ttf")
-        monitor_info = pygame.display.Info()
-        self.monitor_resolution = Vector2(monitor_info.current_w, monitor_info.current_h)
+        self.headless = headless
+        if headless:
+            use_headless_drivers()
+            # The display may already be running with a real video driver
+            if pygame.display.get_init() and pygame.display.get_driver() != "dummy":
+                pygame.display.quit()
+            pygame.display.init()
+        # Functions called with the screen, the list of changed rects and the frame number after each frame
+        self.frame_listeners = []
+        self.frame_number = 0
+        self.frame_ring = None
+        self.recorder = None
+        self.frame_rate = frame_rate
+        self.stats = RenderStats(1 / frame_rate)
+        self.frame_strips = FrameStripBudget(self.FRAME_STRIP_BUDGET) if prerender_animations else None
+        # Display changes posted by other threads to be applied by the display thread at the start of the next frame
+        self.commands = deque()
+        self.show_stats = False
+        # Where the stats overlay was last drawn
+        self._stats_rect = None
+        self.dirty_rendering = dirty_rendering
+        # The state drawn last frame - a change of state needs a full redraw
+        self._drawn_state = None
+        # Set whenever something changes that an idle display needs to draw
+        self._wakeup = Event()
+        # Set once the images of each state group are loaded - all but the logo's load in the background
+        self._assets_ready = list(Event() for _ in range(3))
+        self._asset_loader = None
+        self._asset_error = None
+        # The thread preparing the latest resolution change and how many changes there have been
+        self._resolution_lock = Lock()
+        self._resolution_changer = None
+        self._resolution_changes = 0
+        self.assets = Assets(ASSET_DIR, ASSET_BUNDLE)
+        self.font_helper = FontHelper(self.assets.path(self.FONT), self.assets.font_data(self.FONT))
+        self.stats.add_cache("text", self.font_helper.text_cache)
+        self.image_cache = ScaledImageCache(CACHE_DIR)
+        if headless:
+            self.monitor_resolution = Vector2(resolution or self.RAW_RESOLUTION)
+        else:
+            monitor_info = pygame.display.Info()
+            self.monitor_resolution = Vector2(monitor_info.current_w, monitor_info.current_h)
         if not resolution:
             resolution = Vector2(self.monitor_resolution)
         if not isinstance(resolution, Vector2):
@@ -632,6 +1063,7 @@ class GraphicsManager:
         self.clock = pygame.time.Clock()
 
         # Create static objects
+        self.blank_bg = None
         self.main_bg = None
         self.fm_bg = None
         self.small_logo = None
@@ -650,7 +1082,7 @@ class GraphicsManager:
         self.fm_points = TextLabel(self.font_helper)
 
         # Add sprites to groups for the different states
-        self.state_groups = list(pygame.sprite.OrderedUpdates() for _ in range(3))
+        self.state_groups = list(pygame.sprite.LayeredDirty() for _ in range(3))
         # Logo
         self.state_groups[0].add(self.logo_split)
         self.state_groups[0].add(self.id_display)
@@ -669,11 +1101,13 @@ class GraphicsManager:
         self.state_groups[2].add(self.fm_timer)
         self.state_groups[2].add(self.logo_split)
         self.state_groups[2].add(self.id_display)
+        for sprite in set().union(*self.state_groups):
+            self.stats.instrument_sprite(sprite)
 
         # Create the display screen and update sprite images
         os.environ["SDL_VIDEO_CENTERED"] = '1'
         pygame.display.set_caption("The Feud")
-        pygame.display.set_icon(pygame.image.load(ASSET_DIR + r"\images\icon.png"))
+        pygame.display.set_icon(self.assets.image("images/icon.png"))
         self.screen = None
         self.set_resolution(resolution)
 
@@ -695,117 +1129,591 @@ class GraphicsManager:
         ret.height *= self.scaling.y
         return ret
 
-    def scale_image(self, image):
+    def scaling_for(self, resolution):
+        """
+        :return: the scaling of the visuals at the given resolution
+        """
+        return Vector2(resolution.x / self.RAW_RESOLUTION.x, resolution.y / self.RAW_RESOLUTION.y)
+
+    def scale_image(self, image, scaling=None, smooth=True):
         """
         Gets a scaled and converted copy of the image provided
 
         :param image: the image to scale
+        :param scaling: the scaling to apply (the current scaling by default)
+        :param smooth: whether to filter the image while scaling (slower but better looking)
 
         :return: a scaled and converted copy of the image
         """
-        return pygame.transform.smoothscale(image,
-                                            (int(image.get_width() * self.scaling.x),
-                                             int(image.get_height() * self.scaling.y))).convert()
+        scaling = self.scaling if scaling is None else scaling
+        scale = pygame.transform.smoothscale if smooth else pygame.transform.scale
+        return scale(image, (int(image.get_width() * scaling.x), int(image.get_height() * scaling.y))).convert()
 
-    def scale_image_alpha(self, image):
+    def scale_image_alpha(self, image, scaling=None, smooth=True):
         """
         Gets a scaled and alpha converted copy of the image provided
 
         :param image: the image to scale
+        :param scaling: the scaling to apply (the current scaling by default)
+        :param smooth: whether to filter the image while scaling (slower but better looking)
 
         :return: a scaled and alpha converted copy of the image
         """
-        return pygame.transform.smoothscale(image.convert_alpha(),
-                                            (int(image.get_width() * self.scaling.x),
-                                             int(image.get_height() * self.scaling.y))).convert_alpha()
+        scaling = self.scaling if scaling is None else scaling
+        scale = pygame.transform.smoothscale if smooth else pygame.transform.scale
+        return scale(image.convert_alpha(),
+                     (int(image.get_width() * scaling.x), int(image.get_height() * scaling.y))).convert_alpha()
 
     @staticmethod
     def vec_to_int_tuple(vec):
         return tuple([int(vec.x), int(vec.y)])
 
+    def _load_cached(self, name, resolution, source_digests, alpha, build, rough_images):
+        """
+        Gets a scaled image from the scaled image cache, building it when missing
+
+        :param build: function building the image given whether to scale it smoothly
+        :param rough_images: set to add the names of images quickly scaled roughly because they were not cached to,
+        or None to always scale smoothly
+        """
+        size = self.vec_to_int_tuple(resolution)
+        if rough_images is None:
+            return self.image_cache.get(name, size, source_digests, alpha, lambda: build(True))
+        image = self.image_cache.find(name, size, source_digests, alpha)
+        if image is None:
+            rough_images.add(name)
+            image = build(False)
+        return image
+
+    def load_scaled_image(self, filename, alpha=False, resolution=None, rough_images=None):
+        """
+        Gets a scaled and converted image from the images folder, using the scaled image cache when possible
+
+        :param filename: the filename of the image in the images folder
+        :param alpha: whether to keep the per pixel alpha of the image
+        :param resolution: the resolution to scale for (the current resolution by default)
+        :param rough_images: set to add the name of the image to if it is scaled roughly for speed, or None to always
+        scale smoothly
+
+        :return: a scaled and converted image
+        """
+        name = "images/" + filename
+        resolution = self.resolution if resolution is None else resolution
+        scale = self.scale_image_alpha if alpha else self.scale_image
+        with profiling.phase("image " + filename):
+            return self._load_cached(filename.rsplit(".")[0], resolution, [self.assets.digest(name)], alpha,
+                                     lambda smooth: scale(self.assets.image(name), self.scaling_for(resolution),
+                                                          smooth),
+                                     rough_images)
+
+    def load_scaled_hidden_card(self, rank, resolution=None, rough_images=None):
+        """
+        Gets the scaled hidden main card image for the given rank, using the scaled image cache when possible
+
+        :param rank: the rank shown on the card (1 to 8)
+        :param resolution: the resolution to scale for (the current resolution by default)
+        :param rough_images: set to add the name of the image to if it is scaled roughly for speed, or None to always
+        scale smoothly
+
+        :return: a scaled and converted hidden card image
+        """
+        bg_name = "images/hidden_card.png"
+        num_name = "images/{}.png".format(rank)
+        resolution = self.resolution if resolution is None else resolution
+
+        def build(smooth):
+            # A copy as the card image may share the asset bundle's memory
+            card_image = self.assets.image(bg_name).copy()
+            card_image.blit(self.assets.image(num_name), self.MAIN_CARDS_RANK_NUM_ON_CARD)
+            return self.scale_image(card_image, self.scaling_for(resolution), smooth)
+
+        with profiling.phase("image hidden card {}".format(rank)):
+            return self._load_cached("hidden_card_{}".format(rank), resolution,
+                                     [self.assets.digest(bg_name), self.assets.digest(num_name)], False, build,
+                                     rough_images)
+
+    def strip_progress(self, duration):
+        """
+        Gets the progress values to pre-render an animation's frames at - one per frame at the frame rate
+
+        :param duration: how long the animation takes in seconds
+
+        :return: list of evenly spaced progress values from 0 to 1
+        """
+        steps = max(1, ceil(duration * self.frame_rate))
+        return [step / steps for step in range(steps + 1)]
+
+    def release_strips(self, sprite):
+        """
+        Frees the pre-rendered animation frames of a sprite
+        """
+        if self.frame_strips is not None:
+            self.frame_strips.release(sprite)
+
     def set_resolution(self, resolution):
         """
         Updates the resolution scaling for the visuals - also update all components that need to be updated
 
         :param resolution: the resolution of the new screen (a Vector2 with width and height)
         """
+        # Changing the display mode while images are being converted for it is not safe
+        if self._asset_loader:
+            self._asset_loader.join()
+        for ready in self._assets_ready:
+            ready.clear()
+        self.screen = pygame.display.set_mode(self.vec_to_int_tuple(resolution), pygame.NOFRAME)
+        self._use_resolution(resolution)
+        # Create the scaled images shown while preparing now and the rest in the background
+        self._set_logo_displays(self._load_logo_images(self.resolution))
+        self._assets_ready[0].set()
+        self._asset_loader = Thread(target=self._load_state_assets, daemon=True)
+        self._asset_loader.start()
+
+    def _use_resolution(self, resolution):
+        """
+        Updates the resolution scaling for a screen of the given resolution
+        """
         # Clear cached fonts
         self.font_helper.clear_cache()
-        # Get raw images
-        raw_logo_left = pygame.image.load(ASSET_DIR + r"\images\logo_left.png")
-        raw_logo_right = pygame.image.load(ASSET_DIR + r"\images\logo_right.png")
-        raw_main_board = pygame.image.load(ASSET_DIR + r"\images\main_board.png")
-        raw_main_card_revealed = pygame.image.load(ASSET_DIR + r"\images\answer_card.png")
-        raw_main_card_hidden = list()
-        hidden_bg = pygame.image.load(ASSET_DIR + r"\images\hidden_card.png")
-        for i in range(8):
-            num_image = pygame.image.load(ASSET_DIR + r"\images\{}.png".format(i + 1))
-            current_image = hidden_bg.copy()
-            current_image.blit(num_image, self.MAIN_CARDS_RANK_NUM_ON_CARD)
-            raw_main_card_hidden.append(current_image)
-        raw_strike = pygame.image.load(ASSET_DIR + r"\images\strike.png")
-        raw_small_logo = pygame.image.load(ASSET_DIR + r"\images\small_logo.png")
-        raw_fm_board = pygame.image.load(ASSET_DIR + r"\images\fast_money_board.png")
-        raw_fm_red_box = pygame.image.load(ASSET_DIR + r"\images\fast_money_red_box.png")
-        # Update scaling
-        self.screen = pygame.display.set_mode(self.vec_to_int_tuple(resolution), pygame.NOFRAME)
-        self.scaling.update(resolution.x / self.RAW_RESOLUTION.x, resolution.y / self.RAW_RESOLUTION.y)
+        scaling = self.scaling_for(resolution)
+        self.scaling.update(scaling.x, scaling.y)
         self.resolution = Vector2(resolution)
-        # Create scaled images
-        self.main_bg = self.scale_image(raw_main_board)
-        self.fm_bg = self.scale_image(raw_fm_board)
+        self._drawn_state = None
+        self._stats_rect = None
+
+    def change_resolution(self, resolution):
+        """
+        Switches the display to a new resolution (such as for another projector) while it keeps running.
+        The images are scaled for the new resolution in the background while the current ones are still shown, then
+        swapped in between frames. Images not already in the scaled image cache are first scaled roughly, which is
+        quick, then smoothly, which is swapped in again once done.
+
+        :param resolution: the new resolution (a Vector2 with width and height or an array)
+
+        :raises ValueError: if the width or height is not more than 0
+        """
+        if resolution[0] <= 0 or resolution[1] <= 0:
+            raise ValueError("The resolution must be more than 0 wide and high: {}".format(tuple(resolution)))
+        with self._resolution_lock:
+            self._resolution_changes += 1
+            previous = self._resolution_changer
+            self._resolution_changer = Thread(target=self._prepare_resolution,
+                                              args=(Vector2(resolution), self._resolution_changes, previous),
+                                              daemon=True)
+            self._resolution_changer.start()
+
+    def _resolution_superseded(self, change):
+        return change != self._resolution_changes
+
+    def _prepare_resolution(self, resolution, change, previous):
+        """
+        Scales the images for a new resolution and has the display thread swap them in (run in the background)
+
+        :param resolution: the new resolution
+        :param change: the number of the resolution change - a later change replaces this one
+        :param previous: the thread preparing the previous change or None
+        """
+        # Only one set of images is converted at a time and never while the display mode changes
+        if previous is not None:
+            previous.join()
+        if self._asset_loader:
+            self._asset_loader.join()
+        if self._resolution_superseded(change):
+            return
+        try:
+            rough_images = set()
+            images = self._load_resolution_images(resolution, rough_images)
+            if self._resolution_superseded(change):
+                return
+            swapped = Event()
+            self.post(self._swap_resolution, resolution, images, swapped)
+            swapped.wait()
+            if not rough_images or self._resolution_superseded(change):
+                return
+            images = self._load_resolution_images(resolution)
+            if not self._resolution_superseded(change):
+                self.post(self._swap_resolution, resolution, images, None)
+        except (pygame.error, OSError, ValueError) as error:
+            # The current images keep being shown
+            print("Could not change the resolution: {}".format(error))
+
+    def _load_resolution_images(self, resolution, rough_images=None):
+        return (self._load_logo_images(resolution, rough_images), self._load_main_images(resolution, rough_images),
+                self._load_fast_money_images(resolution, rough_images))
+
+    def _swap_resolution(self, resolution, images, swapped):
+        """
+        Shows the images prepared for a resolution, changing the display mode if the size changed. If the display mode
+        can't be changed the current screen and images are kept. (called by the display thread)
+
+        :param resolution: the resolution the images were scaled for
+        :param images: tuple of the logo, main game and fast money images
+        :param swapped: event to set once swapped or None
+        """
+        if self.vec_to_int_tuple(resolution) != self.screen.get_size():
+            try:
+                self.screen = pygame.display.set_mode(self.vec_to_int_tuple(resolution), pygame.NOFRAME)
+            except pygame.error as error:
+                print("Could not change the resolution: {}".format(error))
+                if swapped is not None:
+                    swapped.set()
+                return
+            if self.frame_ring:
+                self.frame_ring.fit(self.screen.get_size())
+        self._use_resolution(resolution)
+        logo_images, main_images, fast_money_images = images
+        self._set_logo_displays(logo_images)
+        self._set_main_displays(main_images)
+        self._set_fast_money_displays(fast_money_images)
+        if swapped is not None:
+            swapped.set()
+
+    def _load_logo_images(self, resolution, rough_images=None):
+        return {"logo_left": self.load_scaled_image("logo_left.png", resolution=resolution,
+                                                    rough_images=rough_images),
+                "logo_right": self.load_scaled_image("logo_right.png", resolution=resolution,
+                                                     rough_images=rough_images)}
+
+    def _load_main_images(self, resolution, rough_images=None):
+        return {"main_bg": self.load_scaled_image("main_board.png", resolution=resolution, rough_images=rough_images),
+                "small_logo": self.load_scaled_image("small_logo.png", True, resolution, rough_images),
+                "strike": self.load_scaled_image("strike.png", True, resolution, rough_images),
+                "main_card_revealed": self.load_scaled_image("answer_card.png", resolution=resolution,
+                                                             rough_images=rough_images),
+                "hidden_cards": list(self.load_scaled_hidden_card(i + 1, resolution, rough_images)
+                                     for i in range(len(self.main_cards)))}
+
+    def _load_fast_money_images(self, resolution, rough_images=None):
+        return {"fm_bg": self.load_scaled_image("fast_money_board.png", resolution=resolution,
+                                                rough_images=rough_images),
+                "fm_red_box": self.load_scaled_image("fast_money_red_box.png", True, resolution, rough_images)}
+
+    def _load_state_assets(self):
+        """
+        Loads the images of the main game and then fast money (run in the background).
+        Sprites are set up on the display thread as other threads may already be changing them.
+        """
+        try:
+            self.post(self._set_main_displays, self._load_main_images(self.resolution))
+            self._assets_ready[1].set()
+            self.post(self._set_fast_money_displays, self._load_fast_money_images(self.resolution))
+        except (pygame.error, OSError) as error:
+            # Raised again by whatever waits for the images
+            self._asset_error = error
+        finally:
+            for ready in self._assets_ready:
+                ready.set()
+
+    def _set_logo_displays(self, images):
+        self.blank_bg = pygame.Surface(self.vec_to_int_tuple(self.resolution)).convert()
+        self.blank_bg.fill(WHITE)
         self.id_display.set_display(self.scale_rect(self.ID_RECT))
-        self.logo_split.set_display(tuple(resolution), self.scale_image(raw_logo_left),
-                                    self.scale_image(raw_logo_right))
-        self.strikes.set_display(self.scale_rect(self.MAIN_STRIKE_BOX), self.scale_image_alpha(raw_strike))
+        self.logo_split.set_display(self.vec_to_int_tuple(self.resolution), images["logo_left"],
+                                    images["logo_right"])
+
+    def _set_main_displays(self, images):
+        self.main_bg = images["main_bg"]
+        self.small_logo = images["small_logo"]
+        self.strikes.set_display(self.scale_rect(self.MAIN_STRIKE_BOX), images["strike"])
         self.master_score.set_display(self.scale_rect(self.MASTER_SCORE_RECT))
         self.team_1_score.set_display(self.scale_rect(self.TEAM_1_SCORE_RECT))
         self.team_2_score.set_display(self.scale_rect(self.TEAM_2_SCORE_RECT))
         main_cards_text_in_card = self.scale_rect(self.MAIN_CARDS_TEXT_IN_CARD)
         main_cards_number_in_card = self.scale_rect(self.MAIN_CARDS_NUMBER_IN_CARD)
-        main_card_revealed = self.scale_image(raw_main_card_revealed)
         for i in range(len(self.main_cards)):
             card_rect = self.MAIN_CARDS_TOPLEFT.copy()
             card_rect.x += int(i / 4) * self.MAIN_CARDS_DELTA.x
             card_rect.y += (i % 4) * self.MAIN_CARDS_DELTA.y
             self.main_cards[i].set_display(self.scale_rect(card_rect), main_cards_text_in_card,
                                            main_cards_number_in_card,
-                                           self.scale_image(raw_main_card_hidden[i]),
-                                           main_card_revealed)
-        self.small_logo = self.scale_image_alpha(raw_small_logo)
+                                           images["hidden_cards"][i],
+                                           images["main_card_revealed"])
+
+    def _set_fast_money_displays(self, images):
+        self.fm_bg = images["fm_bg"]
         fm_cards_text_in_card = self.scale_rect(self.FM_CARDS_TEXT_IN_CARD)
         fm_cards_number_in_card = self.scale_rect(self.FM_CARDS_NUMBER_IN_CARD)
-        fm_red_box = self.scale_image_alpha(raw_fm_red_box)
         for i in range(len(self.fm_cards)):
             card_rect = self.FM_CARDS_TOPLEFT.copy()
             card_rect.x += int(i / 5) * self.FM_CARDS_DELTA.x
             card_rect.y += (i % 5) * self.FM_CARDS_DELTA.y
             self.fm_cards[i].set_display(self.scale_rect(card_rect), fm_cards_text_in_card,
                                          fm_cards_number_in_card,
-                                         fm_red_box)
+                                         images["fm_red_box"])
         self.fm_timer.set_display(self.scale_rect(self.FM_TIMER_RECT))
         self.fm_total_text.set_display(self.scale_rect(self.FM_TOTAL_TEXT))
         self.fm_points.set_display(self.scale_rect(self.FM_TOTAL_NUMBER))
 
-    def update(self, state):
+    def _state_layers(self, state):
         """
-        Updates and then draws all the sprites in the given state
+        Gets the sprite group and background drawn for the given state
 
-        :param state: the state to update and draw for
+        :param state: the state to get the layers of
+
+        :return: tuple of the sprite group and the background image
         """
-        self.screen.fill(WHITE)
+        index = self._group_index(state)
+        return self.state_groups[index], (self.blank_bg, self.main_bg, self.fm_bg)[index]
+
+    @staticmethod
+    def _group_index(state):
         if state == GameState.PREPARING:
-            current_group = self.state_groups[0]
+            return 0
         elif state == GameState.FAST_MONEY:
-            current_group = self.state_groups[2]
-            self.screen.blit(self.fm_bg, (0, 0))
+            return 2
+        return 1
+
+    def assets_loaded(self):
+        """
+        :return: whether the images of every state have loaded
+        """
+        return all(ready.is_set() for ready in self._assets_ready)
+
+    def wait_for_assets(self, state=None):
+        """
+        Blocks until the images shown in a state have loaded
+
+        :param state: the state to wait for or None to wait for all of them
+        """
+        if state is None:
+            for ready in self._assets_ready:
+                ready.wait()
         else:
-            current_group = self.state_groups[1]
-            self.screen.blit(self.main_bg, (0, 0))
-        with self.lock:
-            current_group.update()
-            current_group.draw(self.screen)
+            self._assets_ready[self._group_index(state)].wait()
+        if self._asset_error:
+            raise self._asset_error
+
+    def wake(self):
+        """
+        Wakes the display if it is waiting while idle
+        """
+        self._wakeup.set()
+
+    def post(self, command, *args):
+        """
+        Queues a function to be called by the display thread before the next frame is drawn.
+        Commands are called in the order they are posted.
+
+        :param command: the function to call
+        :param args: the arguments to call the function with
+        """
+        self.commands.append((perf_counter(), command, args))
+        self.wake()
+
+    def apply_commands(self):
+        """
+        Calls all the posted commands - only the display thread should call this once it is running
+        """
+        while self.commands:
+            posted, command, args = self.commands.popleft()
+            command(*args)
+            self.stats.command_latency.add(perf_counter() - posted)
+
+    def repaint(self):
+        """
+        Forces the whole screen to be redrawn on the next update
+        """
+        self._drawn_state = None
+        self.wake()
+
+    def is_idle(self, state):
+        """
+        Checks whether updating the given state would draw exactly what is already on the screen
+
+        :param state: the state that would be updated
+
+        :return: true if nothing is animating or has changed since the last update
+        """
+        if state != self._drawn_state or self.commands:
+            return False
+        for sprite in self._state_layers(state)[0]:
+            if sprite.dirty or (isinstance(sprite, AnimatedSprite) and sprite.is_anim_active()):
+                return False
+        return True
+
+    def wait_while_idle(self, state, timeout):
+        """
+        Blocks while the display is idle until something changes or the timeout passes
+
+        :param state: the state that would be updated
+        :param timeout: the longest time to wait in seconds
+
+        :return: true if the display was idle
+        """
+        # Clear before checking so a change made during the check still wakes the wait
+        self._wakeup.clear()
+        if not self.is_idle(state):
+            return False
+        self._wakeup.wait(timeout)
+        return True
+
+    def run_frame(self, state, idle_rendering=True):
+        """
+        Handles the window events then updates the display unless it is idle - call repeatedly on the display thread
+
+        :param state: the state to show
+        :param idle_rendering: whether to stop presenting frames while nothing changes
+        """
+        pygame.event.pump()
+        # The window contents may have been lost while covered
+        if pygame.event.get(pygame.VIDEOEXPOSE):
+            self.repaint()
+        if idle_rendering and self.wait_while_idle(state, IDLE_WAKE_SECS):
+            return
+        self.update(state)
+
+    def save_stats_csv(self, path):
+        """
+        Saves the render stats as a CSV file
+
+        :return: true if saved
+        """
+        return self.stats.write_csv(path)
+
+    def set_stats_visible(self, visible):
+        """
+        Sets whether the timing stats overlay is drawn in the top left corner of the screen
+
+        :param visible: whether the overlay is shown
+        """
+        self.show_stats = visible
+        self._stats_rect = None
+        self.repaint()
+
+    def _draw_stats(self):
+        """
+        Draws the timing stats overlay
+
+        :return: the rect drawn over
+        """
+        font = self.font_helper.get(max(10, int(24 * self.scaling.y)))
+        line_images = [font.render(line, False, TEXT_COLOR, (0, 0, 0)) for line in self.stats.summary_lines()]
+        self._stats_rect = pygame.Rect(0, 0, max(image.get_width() for image in line_images),
+                                       sum(image.get_height() for image in line_images))
+        y = 0
+        for image in line_images:
+            self.screen.blit(image, (0, y))
+            y += image.get_height()
+        return self._stats_rect
+
+    def update(self, state):
+        """
+        Updates and then draws all the sprites in the given state
+
+        :param state: the state to update and draw for
+        """
+        # Only blocks if the state is shown before its images have loaded
+        self.wait_for_assets(state)
+        frame_start = perf_counter()
+        # Commands can swap the screen and backgrounds so they are applied first
+        self.apply_commands()
+        current_group, background = self._state_layers(state)
+        # Everything is redrawn when not in dirty mode or when the state (and so background) changed
+        full_redraw = not self.dirty_rendering or state != self._drawn_state
+        if self._stats_rect:
+            # Clear the last overlay
+            current_group.repaint_rect(self._stats_rect)
+        update_start = perf_counter()
+        current_group.update()
+        draw_start = perf_counter()
+        # LayeredDirty only redraws the dirty areas while in its update mode
+        current_group._use_update = not full_redraw
+        dirty_rects = current_group.draw(self.screen, background)
+        if full_redraw:
+            # Only the dirty update mode clears the flags of the sprites it drew
+            for sprite in current_group:
+                if sprite.dirty == 1:
+                    sprite.dirty = 0
+        self._drawn_state = state
         if state == GameState.REVEALING:
-            self.screen.blit(self.small_logo, self.master_score.rect.topleft)
-        pygame.display.flip()
-        self.clock.tick(TICKS_PER_SEC)
+            # The logo is translucent so it is only drawn again over a freshly redrawn area
+            logo_rect = self.small_logo.get_rect(topleft=self.master_score.rect.topleft)
+            if full_redraw:
+                self.screen.blit(self.small_logo, logo_rect)
+            else:
+                for rect in dirty_rects:
+                    area = logo_rect.clip(rect)
+                    if area:
+                        self.screen.blit(self.small_logo, area, area.move(-logo_rect.x, -logo_rect.y))
+        if self.show_stats:
+            dirty_rects.append(self._draw_stats())
+        present_start = perf_counter()
+        if full_redraw:
+            pygame.display.flip()
+        elif dirty_rects:
+            pygame.display.update(dirty_rects)
+        frame_end = perf_counter()
+        self.stats.add_frame({"commands": update_start - frame_start, "update": draw_start - update_start,
+                              "draw": present_start - draw_start, "present": frame_end - present_start},
+                             frame_end - frame_start)
+        self.frame_number += 1
+        if self.frame_number == 1:
+            profiling.mark("first frame presented")
+        for listener in self.frame_listeners:
+            listener(self.screen, dirty_rects, self.frame_number)
+        self.clock.tick(self.frame_rate)
+
+    def get_frame_bytes(self, pixel_format="RGB"):
+        """
+        Gets a copy of the pixels of the last composed frame
+
+        :param pixel_format: the pygame string format of the pixels (such as "RGB" or "RGBA")
+
+        :return: the pixels as bytes in rows from the top left
+        """
+        return pygame.image.tostring(self.screen, pixel_format)
+
+    def save_frame(self, path):
+        """
+        Saves the last composed frame as an image file
+
+        :param path: the path to save to (the extension chooses the format, such as .png)
+        """
+        pygame.image.save(self.screen, path)
+
+    def save_frames_to(self, directory, prefix=""):
+        """
+        Saves every frame presented from now on as a numbered PNG file
+
+        :param directory: the directory to save the frames in
+        :param prefix: text to start the file names with (so a restarted display does not replace earlier frames)
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.frame_listeners.append(lambda _, __, frame_number: self.save_frame(
+            os.path.join(directory, "{}frame_{:06d}.png".format(prefix, frame_number))))
+
+    def share_frames_to(self, ring_path):
+        """
+        Publishes every frame presented from now on into a memory mapped frame ring for other processes to read
+
+        :param ring_path: the path of the frame ring file
+        """
+        max_size = (int(max(self.monitor_resolution.x, self.resolution.x)),
+                    int(max(self.monitor_resolution.y, self.resolution.y)))
+        self.frame_ring = FrameRing(ring_path, max_size)
+        self.frame_listeners.append(self.frame_ring)
+
+    def record_to(self, video_path):
+        """
+        Records every frame presented from now on to a video file (sounds are added with record_sound)
+
+        :param video_path: the path of the video file
+        """
+        self.recorder = SessionRecorder(video_path, self.frame_rate)
+        self.frame_listeners.append(self.recorder)
+
+    def record_sound(self, name):
+        """
+        Records that a sound was played if recording
+        """
+        if self.recorder:
+            self.recorder.add_sound(name)
+
+    def close(self):
+        """
+        Finishes the frame outputs - call once the display has stopped updating
+        """
+        if self.frame_ring:
+            self.frame_ring.close()
+        if self.recorder:
+            self.recorder.stop()
@@ -1,23 +1,33 @@
+# First so the imports after it are timed when profiling startup
+from src import profiling
+
 import os.path as path
+from argparse import ArgumentParser
 from os import makedirs
 from tkinter import Tk, Label, Entry, Spinbox, Button, PhotoImage, END, Frame
 from tkinter.messagebox import askquestion, showerror, showinfo
 
-from src.survey import Survey, SURVEY_DIR
+from src.library import SurveyLibrary, SURVEY_LIBRARY
+from src.survey import Survey, SURVEY_DIR, SURVEY_EXTENSION
 
-ICON_DIR = r"assets/images/"
+ICON_DIR = path.join("assets", "images")
 
 
 class EditorApp:
     BG_COLOR = "#d9d9d9"
     BUTTON_COLOR = "#dfdfdf"
 
-    def __init__(self, root):
+    def __init__(self, root, library=None):
+        """
+        :param root: the Tk root window
+        :param library: the SurveyLibrary to load and save surveys in instead of the surveys folder
+        """
         self.root = root
+        self.library = library
         # Main Window Config
         root.geometry("480x240")
         root.title("The Feud Survey Editor")
-        root.iconphoto(True, PhotoImage(file=path.realpath(ICON_DIR + r"/icon.png")))
+        root.iconphoto(True, PhotoImage(file=path.realpath(path.join(ICON_DIR, "icon.png"))))
         root.configure(background=self.BG_COLOR)
         root.protocol("WM_DELETE_WINDOW", self.on_close)
         # File Name
@@ -74,13 +84,17 @@ class EditorApp:
                               "This will overwrite the current values in the editor. Are you sure you want to continue?")
             if ret == "no":
                 return
-        # Attempt load survey from file
-        survey = Survey.load_survey_file(path.realpath(SURVEY_DIR + self.fn_entry.get() + ".survey"))
+        # Attempt load survey from library or file
+        if self.library is not None:
+            survey = self.library.read(self.fn_entry.get())
+        else:
+            filepath = path.realpath(path.join(SURVEY_DIR, self.fn_entry.get() + SURVEY_EXTENSION))
+            survey = Survey.load_survey_file(filepath)
+            # Want to be able to load again if another program edits the survey file
+            Survey.clear_surveys()
         if not survey:
             showerror("Error", "Could not load the survey from given filename")
             return
-        # Want to be able to load again if another program edits the survey file
-        Survey.clear_surveys()
         # Get question from survey
         self.sq_entry.delete(0, END)
         self.sq_entry.insert(0, survey.question)
@@ -134,15 +148,23 @@ class EditorApp:
                 return
         survey = Survey(survey_dict)
         # Confirm overwrite and save
-        if not path.exists(SURVEY_DIR):
-            makedirs(SURVEY_DIR)
-        filepath = path.realpath(SURVEY_DIR + self.fn_entry.get() + ".survey")
-        if path.exists(filepath):
+        if self.library is not None:
+            exists = self.fn_entry.get() in self.library
+        else:
+            if not path.exists(SURVEY_DIR):
+                makedirs(SURVEY_DIR)
+            filepath = path.realpath(path.join(SURVEY_DIR, self.fn_entry.get() + SURVEY_EXTENSION))
+            exists = path.exists(filepath)
+        if exists:
             ret = askquestion("Confirm Action",
                               "Saving this will overwrite an existing file. Are you sure you want to continue?")
             if ret == "no":
                 return
-        if survey.save_to_file(filepath):
+        if self.library is not None:
+            saved = self.library.save(self.fn_entry.get(), survey)
+        else:
+            saved = survey.save_to_file(filepath)
+        if saved:
             showinfo("Notice", "Successfully saved survey with ID: {}".format(survey.id))
         else:
             showerror("Error", "Could not save survey")
@@ -188,6 +210,27 @@ class ResponseEntryWidget(Frame):
 
 
 if __name__ == '__main__':
-    master = Tk()
-    EditorApp(master)
+    parser = ArgumentParser(description="Edits The Feud survey files")
+    parser.add_argument("--library", metavar="FILE", nargs="?", const=SURVEY_LIBRARY,
+                        help="load and save surveys in a survey library (created if it does not exist, {} by "
+                             "default) instead of the folder".format(SURVEY_LIBRARY))
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+
+    survey_library = None
+    if args.library:
+        try:
+            survey_library = SurveyLibrary(args.library)
+        except ValueError as library_error:
+            parser.error(str(library_error))
+
+    with profiling.phase("Tk"):
+        master = Tk()
+    with profiling.phase("editor app"):
+        EditorApp(master, survey_library)
+    if args.profile_startup:
+        def finish_profile():
+            profiling.mark("editor window idle")
+            profiling.finish(args.profile_json)
+        master.after_idle(finish_profile)
     master.mainloop()
@@ -0,0 +1,278 @@
+import mmap
+import os
+import struct
+import time
+from argparse import ArgumentParser
+from collections import namedtuple
+
+import pygame
+
+
+# The ring file starts with a header followed by its frame slots, each a slot header followed by the frame pixels.
+# A writer makes a slot's sequence odd while it changes the slot so readers can tell a torn frame from a whole one.
+_MAGIC = b"FEUDRING"
+_VERSION = 1
+# magic, version, slot count, slot capacity, latest slot, 4 channel masks
+_RING_HEADER = struct.Struct("<8sHHIi4I")
+_LATEST_OFFSET = struct.calcsize("<8sHHI")
+# sequence, frame number, timestamp, width, height, pitch, bytes per pixel, rect count
+_SLOT_HEADER = struct.Struct("<QQdIIIII")
+_RECT = struct.Struct("<iiII")
+# Frames with more changed areas than this list the whole screen as changed instead
+MAX_RECTS = 64
+_SLOT_PIXELS_OFFSET = _SLOT_HEADER.size + MAX_RECTS * _RECT.size
+
+Frame = namedtuple("Frame", ["slot", "sequence", "number", "timestamp", "size", "pitch", "bytes_per_pixel", "rects",
+                             "pixels"])
+
+
+class FrameRing:
+    """
+    Publishes every composed frame into a memory mapped file so other local processes can read them without capturing
+    the screen. There are two frame slots written in turn so the latest whole frame can be read while the next is
+    written.
+    Use as a frame listener of the GraphicsManager.
+    """
+
+    SLOTS = 2
+
+    def __init__(self, path, max_size):
+        """
+        Creates (or replaces) the ring file
+
+        :param path: the path of the ring file
+        :param max_size: the largest frame size to hold (tuple of width and height) - bigger frames are skipped
+        """
+        self.path = path
+        self.skipped_frames = 0
+        self._file = None
+        self._map = None
+        self._create(max_size)
+
+    def _create(self, max_size):
+        """
+        Makes an empty ring file with slots for frames up to the given size and maps it. A new file is written then
+        moved over any old one, so readers still mapping the old file are never cut short.
+
+        :raises OSError: if the file could not be made, leaving any old file as it was
+        """
+        capacity = max_size[0] * max_size[1] * 4
+        slot_size = _SLOT_PIXELS_OFFSET + capacity
+        new_path = self.path + ".new"
+        try:
+            with open(new_path, "wb") as file:
+                file.truncate(_RING_HEADER.size + self.SLOTS * slot_size)
+            os.replace(new_path, self.path)
+        except OSError:
+            if os.path.exists(new_path):
+                os.remove(new_path)
+            raise
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self._latest = -1
+        self._sequences = [0] * self.SLOTS
+        self._masks = None
+        self._open()
+        self._write_ring_header((0, 0, 0, 0))
+
+    def _open(self):
+        self._file = open(self.path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def fit(self, size):
+        """
+        Makes sure frames of a size can be published, replacing the ring file with a bigger one if needed (readers
+        reopen it when FrameRingReader.replaced says so). If it can't be replaced, such as on Windows while a reader
+        has it open, the ring is kept and the bigger frames are skipped.
+
+        :param size: the frame size (tuple of width and height)
+        """
+        if size[0] * size[1] * 4 <= self.capacity:
+            return
+        # Closed first as Windows does not replace a file that is open
+        self.close()
+        try:
+            self._create(size)
+        except OSError as error:
+            print("Could not make the frame ring bigger, so bigger frames are skipped: {}".format(error))
+            self._open()
+
+    def _write_ring_header(self, masks):
+        _RING_HEADER.pack_into(self._map, 0, _MAGIC, _VERSION, self.SLOTS, self.capacity, self._latest, *masks)
+
+    def _slot_offset(self, slot):
+        return _RING_HEADER.size + slot * self.slot_size
+
+    def __call__(self, screen, dirty_rects, frame_number):
+        self.publish(screen, dirty_rects, frame_number)
+
+    def publish(self, screen, dirty_rects, frame_number):
+        """
+        Writes a frame into the slot not holding the latest frame then makes it the latest
+
+        :param screen: the composed frame
+        :param dirty_rects: the areas that changed since the last frame
+        :param frame_number: the number of the frame
+        """
+        width, height = screen.get_size()
+        pitch = screen.get_pitch()
+        if pitch * height > self.capacity:
+            self.skipped_frames += 1
+            return
+        masks = screen.get_masks()
+        if masks != self._masks:
+            self._masks = masks
+            self._write_ring_header(masks)
+        if len(dirty_rects) > MAX_RECTS:
+            dirty_rects = [screen.get_rect()]
+
+        slot = (self._latest + 1) % self.SLOTS
+        offset = self._slot_offset(slot)
+        sequence = self._sequences[slot] + 1
+        # Odd while writing
+        struct.pack_into("<Q", self._map, offset, sequence)
+        for index, rect in enumerate(dirty_rects):
+            _RECT.pack_into(self._map, offset + _SLOT_HEADER.size + index * _RECT.size, rect[0], rect[1], rect[2],
+                            rect[3])
+        pixels_offset = offset + _SLOT_PIXELS_OFFSET
+        self._map[pixels_offset:pixels_offset + pitch * height] = screen.get_buffer()
+        sequence += 1
+        _SLOT_HEADER.pack_into(self._map, offset, sequence, frame_number, time.time(), width, height, pitch,
+                               screen.get_bytesize(), len(dirty_rects))
+        self._sequences[slot] = sequence
+        self._latest = slot
+        struct.pack_into("<i", self._map, _LATEST_OFFSET, slot)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class FrameRingReader:
+    """
+    Reads the frames published by a FrameRing in another process
+    """
+
+    def __init__(self, path):
+        """
+        :param path: the path of the ring file
+
+        :raises ValueError: if the file is not a frame ring
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.slots, self.capacity, _, *_ = _RING_HEADER.unpack_from(self._map)
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError("Not a frame ring: {}".format(path))
+        self.slot_size = _SLOT_PIXELS_OFFSET + self.capacity
+
+    def replaced(self):
+        """
+        :return: whether the ring file has been replaced (such as by a bigger one after the resolution changed), so
+        this reader no longer gets new frames and should be reopened
+        """
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except OSError:
+            return False
+
+    @property
+    def masks(self):
+        """
+        :return: the red, green, blue and alpha masks of the frame pixels
+        """
+        return _RING_HEADER.unpack_from(self._map)[5:]
+
+    def latest(self):
+        """
+        Gets the latest whole frame. The pixels are a view into the ring, so check the frame is still valid after
+        using them.
+
+        :return: the Frame or None if no whole frame is available
+        """
+        slot = _RING_HEADER.unpack_from(self._map)[4]
+        if slot < 0:
+            return None
+        offset = _RING_HEADER.size + slot * self.slot_size
+        sequence, number, timestamp, width, height, pitch, bytes_per_pixel, rect_count = \
+            _SLOT_HEADER.unpack_from(self._map, offset)
+        if sequence % 2:
+            return None
+        rects = [pygame.Rect(_RECT.unpack_from(self._map, offset + _SLOT_HEADER.size + index * _RECT.size))
+                 for index in range(rect_count)]
+        pixels_offset = offset + _SLOT_PIXELS_OFFSET
+        pixels = memoryview(self._map)[pixels_offset:pixels_offset + pitch * height]
+        return Frame(slot, sequence, number, timestamp, (width, height), pitch, bytes_per_pixel, rects, pixels)
+
+    def still_valid(self, frame):
+        """
+        :return: whether the frame has not been overwritten since it was read
+        """
+        offset = _RING_HEADER.size + frame.slot * self.slot_size
+        return struct.unpack_from("<Q", self._map, offset)[0] == frame.sequence
+
+    def read_surface(self):
+        """
+        Copies the latest whole frame into a surface
+
+        :return: tuple of the Frame and the surface or None if no whole frame could be read
+        """
+        frame = self.latest()
+        if frame is None:
+            return None
+        surface = pygame.Surface(frame.size, 0, frame.bytes_per_pixel * 8, self.masks)
+        if surface.get_pitch() == frame.pitch:
+            surface.get_buffer().write(frame.pixels.tobytes(), 0)
+        else:
+            row_bytes = frame.size[0] * frame.bytes_per_pixel
+            buffer = surface.get_buffer()
+            for y in range(frame.size[1]):
+                start = y * frame.pitch
+                buffer.write(frame.pixels[start:start + row_bytes].tobytes(), y * surface.get_pitch())
+            del buffer
+        frame.pixels.release()
+        if not self.still_valid(frame):
+            return None
+        return frame, surface
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+if __name__ == '__main__':
+    # A reference reader that reports the frames it sees and can save the latest one
+    parser = ArgumentParser(description="Reads frames published by the game with --share-frames")
+    parser.add_argument("path", help="the frame ring file")
+    parser.add_argument("--seconds", type=float, default=5, help="how long to read for")
+    parser.add_argument("--save", metavar="PNG", help="save the last frame read as an image")
+    args = parser.parse_args()
+
+    reader = FrameRingReader(args.path)
+    last_number = None
+    frames_read = 0
+    last_surface = None
+    end = time.monotonic() + args.seconds
+    while time.monotonic() < end:
+        result = reader.read_surface()
+        if result is not None and result[0].number != last_number:
+            frame, last_surface = result
+            if last_number is not None and frame.number != last_number + 1:
+                print("Missed {} frames".format(frame.number - last_number - 1))
+            last_number = frame.number
+            frames_read += 1
+            print("Frame {} {}x{} latency {:.1f} ms changed {}".format(
+                frame.number, frame.size[0], frame.size[1], (time.time() - frame.timestamp) * 1000,
+                [tuple(rect) for rect in frame.rects]))
+        elif reader.replaced():
+            reader.close()
+            reader = FrameRingReader(args.path)
+            print("Reopened the resized frame ring")
+        else:
+            time.sleep(.002)
+    print("Read {} frames".format(frames_read))
+    if args.save and last_surface is not None:
+        pygame.image.save(last_surface, args.save)
+    reader.close()
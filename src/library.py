@@ -0,0 +1,197 @@
+import json
+import os
+import sqlite3
+from argparse import ArgumentParser
+from threading import Lock
+
+from src.survey import Survey, SURVEY_DIR, SURVEY_EXTENSION, contents_digest
+
+SURVEY_LIBRARY = "surveys.db"
+# Increase whenever the tables change so older versions of the game refuse the file
+_SCHEMA_VERSION = 1
+
+
+class SurveyLibrary:
+    """
+    A single file (SQLite) database of surveys, an alternative to the surveys folder that is quicker to scan and to copy
+    between the editor and game machines. Each record holds what the survey's file would, and is only read when needed,
+    alongside the survey's ID, question and number of responses for listing the surveys without reading them.
+    """
+
+    def __init__(self, path):
+        """
+        Opens a survey library, creating it if the file does not exist
+
+        :param path: the path of the library file
+
+        :raises ValueError: if the file is not a survey library
+        """
+        self.path = path
+        # Used by the thread loading surveys as well as the window's thread
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = Lock()
+        try:
+            with self._connection:
+                version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+                if version > _SCHEMA_VERSION:
+                    raise ValueError("The survey library is from a newer version: {}".format(path))
+                self._connection.execute("CREATE TABLE IF NOT EXISTS surveys (name TEXT PRIMARY KEY, id TEXT NOT NULL, "
+                                         "question TEXT NOT NULL, response_count INTEGER NOT NULL, "
+                                         "digest BLOB NOT NULL, contents BLOB NOT NULL)")
+                self._connection.execute("CREATE INDEX IF NOT EXISTS surveys_by_id ON surveys (id)")
+                self._connection.execute("PRAGMA user_version = {}".format(_SCHEMA_VERSION))
+        except sqlite3.DatabaseError as error:
+            self.close()
+            raise ValueError("Not a survey library: {} ({})".format(path, error))
+        except ValueError:
+            self.close()
+            raise
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def __contains__(self, name):
+        return bool(self._query("SELECT 1 FROM surveys WHERE name = ?", (name,)))
+
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM surveys")[0][0]
+
+    def summaries(self):
+        """
+        Lists the surveys without reading them (records are checked when saved or imported)
+
+        :return: list of tuples of the name, ID, question, number of responses and contents digest of each survey in
+        order of their names
+        """
+        return [(name, json.loads(survey_id), question, response_count, digest)
+                for name, survey_id, question, response_count, digest in
+                self._query("SELECT name, id, question, response_count, digest FROM surveys ORDER BY name")]
+
+    def read(self, name):
+        """
+        :return: the survey with the given name or None if there is not a valid one
+        """
+        rows = self._query("SELECT contents FROM surveys WHERE name = ?", (name,))
+        return self._parse(rows[0][0], name) if rows else None
+
+    def read_responses(self, name):
+        """
+        :return: list of tuples of the phrase and count of each response of the survey with the given name (empty if
+        there is not a valid one)
+        """
+        survey = self.read(name)
+        if survey is None:
+            return []
+        return [(response.phrase, response.count) for response in survey.responses]
+
+    def read_by_id(self, survey_id):
+        """
+        :return: the survey with the given ID or None if there is not a valid one
+        """
+        rows = self._query("SELECT name, contents FROM surveys WHERE id = ? ORDER BY name LIMIT 1",
+                           (json.dumps(survey_id),))
+        return self._parse(rows[0][1], rows[0][0]) if rows else None
+
+    @staticmethod
+    def _parse(contents, name):
+        try:
+            return Survey.from_contents(contents)
+        except ValueError:
+            print("Survey (" + name + ") in the library is not valid")
+        return None
+
+    def save(self, name, survey):
+        """
+        Saves a survey, replacing any with the same name
+
+        :return: boolean success of saving
+        """
+        return self._save_all([(name, survey, json.dumps(survey.to_data()).encode())])
+
+    def _save_all(self, records):
+        """
+        Saves surveys in one transaction
+
+        :param records: tuples of the name, survey and file contents of each survey
+        """
+        try:
+            with self._lock, self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO surveys (name, id, question, response_count, digest, contents) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(name, json.dumps(survey.id), survey.question, survey.num_responses, contents_digest(contents),
+                      contents) for name, survey, contents in records])
+            return True
+        except sqlite3.Error as error:
+            print("Library (" + self.path + ") could not be saved to: {}".format(error))
+        return False
+
+    def delete(self, name):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM surveys WHERE name = ?", (name,))
+
+    def import_folder(self, directory):
+        """
+        Copies every valid survey file in a folder into the library, replacing surveys with the same names
+
+        :return: the number of surveys imported
+        """
+        records = list()
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(SURVEY_EXTENSION):
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                with open(path, "rb") as file:
+                    contents = file.read()
+                survey = Survey.from_contents(contents)
+            except OSError:
+                print("File (" + path + ") could not be opened")
+                continue
+            except ValueError:
+                print("File (" + path + ") is not a valid survey")
+                continue
+            records.append((filename[:-len(SURVEY_EXTENSION)], survey, contents))
+        return len(records) if self._save_all(records) else 0
+
+    def export_folder(self, directory):
+        """
+        Writes every survey in the library to a survey file in a folder, replacing files with the same names
+
+        :return: the number of surveys exported
+        """
+        os.makedirs(directory, exist_ok=True)
+        count = 0
+        for name, contents in self._query("SELECT name, contents FROM surveys ORDER BY name"):
+            path = os.path.join(directory, name + SURVEY_EXTENSION)
+            try:
+                with open(path, "wb") as file:
+                    file.write(contents)
+                count += 1
+            except OSError:
+                print("Path (" + path + ") could not be saved to")
+        return count
+
+    def close(self):
+        self._connection.close()
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Copies surveys between a survey library and a folder of survey files")
+    parser.add_argument("action", choices=("import", "export"),
+                        help="import the folder's survey files into the library or export the library's surveys to "
+                             "the folder")
+    parser.add_argument("--folder", default=SURVEY_DIR, help="the folder of survey files")
+    parser.add_argument("--library", default=SURVEY_LIBRARY, help="the survey library file")
+    args = parser.parse_args()
+
+    try:
+        library = SurveyLibrary(args.library)
+    except ValueError as library_error:
+        parser.error(str(library_error))
+    if args.action == "import":
+        print("Imported {} surveys into {}".format(library.import_folder(args.folder), args.library))
+    else:
+        print("Exported {} surveys to {}".format(library.export_folder(args.folder), args.folder))
+    library.close()
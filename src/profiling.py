@@ -0,0 +1,148 @@
+import builtins
+import json
+import sys
+from contextlib import contextmanager, nullcontext
+from threading import current_thread, main_thread
+from time import perf_counter
+
+PROFILE_ARGUMENT = "--profile-startup"
+
+
+class StartupProfile:
+    """
+    Records how long each phase of starting up takes, relative to when the profile started
+    """
+
+    def __init__(self):
+        self.started = perf_counter()
+        # Tuples of the name, start, duration and thread name of each phase
+        self.phases = list()
+        # Tuples of the name and time of each milestone
+        self.marks = list()
+        self._original_import = None
+        self._import_depth = 0
+
+    @contextmanager
+    def phase(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, start - self.started, perf_counter() - start, current_thread().name))
+
+    def mark(self, name):
+        self.marks.append((name, perf_counter() - self.started))
+
+    def time_imports(self):
+        """
+        Records every module imported from now on as a phase - only the outermost import of a nested import is recorded
+        """
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def stop_timing_imports(self):
+        if self._original_import:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, *args, **kwargs):
+        if self._import_depth or name in sys.modules or current_thread() is not main_thread():
+            return self._original_import(name, *args, **kwargs)
+        self._import_depth += 1
+        try:
+            with self.phase("import " + name):
+                return self._original_import(name, *args, **kwargs)
+        finally:
+            self._import_depth -= 1
+
+    def report_lines(self):
+        """
+        :return: list of lines listing the phases in the order they started then the milestones.
+        Phases with the same name on the same thread are combined.
+        """
+        combined = dict()
+        for name, start, duration, thread in self.phases:
+            first_start, total, count = combined.get((name, thread), (start, 0, 0))
+            combined[(name, thread)] = (min(first_start, start), total + duration, count + 1)
+        lines = ["Startup profile (start and duration in ms)"]
+        for (name, thread), (start, duration, count) in sorted(combined.items(), key=lambda item: item[1][0]):
+            notes = "" if count == 1 else " x{}".format(count)
+            if thread != main_thread().name:
+                notes += " [{}]".format(thread)
+            lines.append("{:9.1f} {:9.1f}  {}{}".format(start * 1000, duration * 1000, name, notes))
+        for name, time in self.marks:
+            lines.append("{:9.1f} {:>9}  {}".format(time * 1000, "", name))
+        return lines
+
+    def write_json(self, path):
+        """
+        Saves the phases and milestones as JSON
+
+        :return: true if saved
+        """
+        data = {"phases": [{"name": name, "start": start, "duration": duration, "thread": thread}
+                           for name, start, duration, thread in self.phases],
+                "marks": [{"name": name, "time": time} for name, time in self.marks]}
+        try:
+            with open(path, "w") as file:
+                json.dump(data, file, indent=2)
+        except OSError as error:
+            print("Could not save the startup profile: {}".format(error))
+            return False
+        return True
+
+
+# The profile being recorded, if any
+profile = None
+
+
+def add_arguments(parser):
+    """
+    Adds the startup profiling options to an entry point's argument parser
+    """
+    parser.add_argument(PROFILE_ARGUMENT, action="store_true", help="print how long each phase of starting up takes")
+    parser.add_argument("--profile-json", metavar="FILE", help="also save the startup profile as JSON")
+
+
+def start():
+    global profile
+    profile = StartupProfile()
+    profile.time_imports()
+
+
+def phase(name):
+    """
+    Times a phase of starting up if profiling (use with a with statement)
+    """
+    if profile is None:
+        return nullcontext()
+    return profile.phase(name)
+
+
+def mark(name):
+    """
+    Records reaching a milestone of starting up if profiling
+    """
+    if profile is not None:
+        profile.mark(name)
+
+
+def finish(json_path=None):
+    """
+    Stops profiling and prints the report
+
+    :param json_path: the path to also save the report to as JSON
+    """
+    global profile
+    if profile is None:
+        return
+    profile.stop_timing_imports()
+    print("\n".join(profile.report_lines()))
+    if json_path:
+        profile.write_json(json_path)
+    profile = None
+
+
+if PROFILE_ARGUMENT in sys.argv:
+    # Started when first imported so the imports of the entry point that follow are timed too
+    start()
@@ -0,0 +1,248 @@
+import atexit
+import json
+import os
+import shutil
+import struct
+import subprocess
+import zlib
+from multiprocessing import Process, Queue
+from queue import Full
+from time import perf_counter
+
+import pygame
+
+
+class SessionRecorder:
+    """
+    Records the frames the display presents and the sounds played to a video file.
+    Frames are copied on the display thread and converted and encoded by a separate process. When the encoder falls
+    behind, frames are dropped (and counted) rather than holding up the display. If the resolution changes the video
+    carries on in a new file (see segment_path).
+    Use as a frame listener of the GraphicsManager and a sound listener of the AudioManager.
+    """
+
+    # Most frames waiting to be encoded before new frames are dropped
+    QUEUE_FRAMES = 8
+
+    def __init__(self, path, frame_rate):
+        """
+        Starts the encoding process
+
+        :param path: the path of the video file (the sounds are saved next to it with .json added)
+        :param frame_rate: the frame rate of the video
+        """
+        self.path = path
+        self.frame_rate = frame_rate
+        self.recorded_frames = 0
+        self.dropped_frames = 0
+        self.sounds = list()
+        # Dicts of the path, start time and size of each video file
+        self.segments = list()
+        self._start = perf_counter()
+        self._stopped = False
+        self._frames = Queue(self.QUEUE_FRAMES)
+        self._process = Process(target=encode_frames, args=(path, self._frames, frame_rate), daemon=True)
+        self._process.start()
+        # Finishes the video however the program exits (a headless game has no window to close)
+        atexit.register(self.stop)
+
+    def __call__(self, screen, dirty_rects, frame_number):
+        self.add_frame(screen)
+
+    def add_frame(self, screen):
+        """
+        Queues a copy of a presented frame to be encoded, dropping it if the queue is full.
+        The pixels are copied as they are and converted to RGB by the recording process.
+        """
+        if self._stopped or self._frames.full():
+            self.dropped_frames += 1
+            return
+        timestamp = perf_counter() - self._start
+        size = screen.get_size()
+        frame = (timestamp, size, screen.get_bitsize(), screen.get_masks(), screen.get_buffer().raw)
+        try:
+            self._frames.put_nowait(frame)
+        except Full:
+            self.dropped_frames += 1
+            return
+        self.recorded_frames += 1
+        if not self.segments or tuple(self.segments[-1]["size"]) != size:
+            # The recording process starts the first file when recording starts and each other one at its first frame
+            self.segments.append({"path": segment_path(self.path, len(self.segments)),
+                                  "start": round(timestamp, 3) if self.segments else 0, "size": size})
+
+    def add_sound(self, name):
+        """
+        Records that a sound was played
+        """
+        self.sounds.append({"time": round(perf_counter() - self._start, 3), "sound": name})
+
+    def stop(self):
+        """
+        Finishes encoding the queued frames and saves the sounds played (does nothing if already stopped)
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        atexit.unregister(self.stop)
+        # The stop time tells the encoding process to finish
+        self._frames.put(perf_counter() - self._start)
+        self._process.join()
+        with open(self.path + ".json", "w") as file:
+            json.dump({"frame_rate": self.frame_rate, "recorded_frames": self.recorded_frames,
+                       "dropped_frames": self.dropped_frames, "segments": self.segments, "sounds": self.sounds},
+                      file, indent=2)
+        print("Recorded {} frames to {} ({} dropped)".format(self.recorded_frames,
+                                                             ", ".join(segment["path"] for segment in self.segments)
+                                                             or self.path, self.dropped_frames))
+
+
+def segment_path(path, index):
+    """
+    Gets the path of a video file of a recording. The first file is the recording's path and the files started when
+    the resolution changes have a number added (such as session.2.mp4).
+
+    :param path: the path of the recording
+    :param index: the index of the file in the recording
+    """
+    if index == 0:
+        return path
+    root, extension = os.path.splitext(path)
+    return "{}.{}{}".format(root, index + 1, extension)
+
+
+def continuation_path(path):
+    """
+    Gets the path to carry on a recording in a new file (such as after the display restarts), so the files recorded
+    so far are kept: the first numbered file of the recording (see segment_path) that does not exist yet
+
+    :param path: the path of the recording
+    """
+    index = 1
+    while os.path.exists(segment_path(path, index)):
+        index += 1
+    return segment_path(path, index)
+
+
+class _FfmpegEncoder:
+    """
+    Encodes frames with ffmpeg (the format is chosen by the file extension)
+    """
+
+    def __init__(self, ffmpeg, path, size, frame_rate):
+        self._process = subprocess.Popen(
+            [ffmpeg, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+             "-s", "{}x{}".format(*size), "-r", str(frame_rate), "-i", "-", "-pix_fmt", "yuv420p", path],
+            stdin=subprocess.PIPE)
+
+    def write(self, pixels):
+        self._process.stdin.write(pixels)
+
+    def close(self):
+        self._process.stdin.close()
+        self._process.wait()
+
+
+class _ChunkEncoder:
+    """
+    Saves frames as chunks of compressed raw pixels when ffmpeg is not available.
+    The file has a header (magic, width, height and frame rate) followed by chunks, each the number of frames and the
+    length of the zlib compressed RGB pixels of the frames then the compressed pixels.
+    """
+
+    MAGIC = b"FEUDREC1"
+    HEADER = struct.Struct("<8sIIH")
+    CHUNK_HEADER = struct.Struct("<II")
+    CHUNK_FRAMES = 20
+
+    def __init__(self, path, size, frame_rate):
+        self._file = open(path, "wb")
+        self._file.write(self.HEADER.pack(self.MAGIC, size[0], size[1], frame_rate))
+        self._chunk = list()
+
+    def write(self, pixels):
+        self._chunk.append(pixels)
+        if len(self._chunk) >= self.CHUNK_FRAMES:
+            self._flush()
+
+    def _flush(self):
+        data = zlib.compress(b"".join(self._chunk), 1)
+        self._file.write(self.CHUNK_HEADER.pack(len(self._chunk), len(data)))
+        self._file.write(data)
+        self._chunk.clear()
+
+    def close(self):
+        if self._chunk:
+            self._flush()
+        self._file.close()
+
+
+def encode_frames(path, frames, frame_rate):
+    """
+    Encodes queued frames until the stop time is queued (run in the recording process).
+    The display only presents frames when something changes, so each frame is repeated until the time of the next one
+    to keep the video in time. A video can't change resolution, so when the frame size changes the video is finished
+    and the frames carry on in a new file.
+
+    :param path: the path of the recording
+    :param frames: queue of tuples of the frame time, frame size, bits per pixel, color masks and raw pixels
+    :param frame_rate: the frame rate of the video
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    encoder = None
+    segment = 0
+    size = None
+    last_pixels = None
+    # The frame index of the video's first frame and the number of frames written to it
+    start = 0
+    written = 0
+    while True:
+        frame = frames.get()
+        if not isinstance(frame, tuple):
+            stop_time = frame
+            break
+        timestamp, frame_size, bitsize, masks, raw = frame
+        pixels = _to_rgb(frame_size, bitsize, masks, raw)
+        index = round(timestamp * frame_rate)
+        if encoder is not None and frame_size != size:
+            _repeat_frame(encoder, last_pixels, written, max(written + 1, index - start))
+            encoder.close()
+            encoder = None
+            segment += 1
+            # Later videos start at their first frame rather than when recording started
+            start = index
+        if encoder is None:
+            size = frame_size
+            segment_file = segment_path(path, segment)
+            encoder = _FfmpegEncoder(ffmpeg, segment_file, size, frame_rate) if ffmpeg else \
+                _ChunkEncoder(segment_file, size, frame_rate)
+            written = 0
+            last_pixels = pixels
+        written = _repeat_frame(encoder, last_pixels, written, index - start)
+        last_pixels = pixels
+    if encoder is not None:
+        _repeat_frame(encoder, last_pixels, written, max(written + 1, round(stop_time * frame_rate) - start))
+        encoder.close()
+
+
+def _to_rgb(size, bitsize, masks, raw):
+    """
+    Converts the raw pixels of a frame to RGB bytes
+
+    :param raw: the pixels copied from a surface of the given size, bits per pixel and color masks
+    """
+    surface = pygame.Surface(size, 0, bitsize, masks)
+    surface.get_buffer().write(raw, 0)
+    return pygame.image.tostring(surface, "RGB")
+
+
+def _repeat_frame(encoder, pixels, written, index):
+    """
+    Writes a frame until the video reaches the given frame index
+
+    :return: the number of frames written to the video
+    """
+    while written < index:
+        encoder.write(pixels)
+        written += 1
+    return written
@@ -0,0 +1,449 @@
+import atexit
+import traceback
+from multiprocessing import Pipe, Process
+from threading import Event, Thread
+
+import pygame
+
+from src.constants import GameState, TICKS_PER_SEC
+from src.display import GraphicsManager, FastMoneyResponseCard, use_headless_drivers
+from src.recording import continuation_path
+
+
+class _SpriteProxy:
+    """
+    Stands in for a display sprite in the control process - forwards changes to the sprite in the render process
+    """
+
+    def __init__(self, display, key):
+        """
+        :param display: the RemoteDisplay
+        :param key: the name of the sprite in the GraphicsManager (with the index after a dot if in a list)
+        """
+        self._display = display
+        self.key = key
+
+    def _call(self, name, *args):
+        self._display.send(("call", self.key, name, args))
+
+    def _set(self, name, value):
+        self._display.send(("set", self.key, name, value))
+
+    def snapshot(self):
+        """
+        Gets the state to restore in a restarted display
+
+        :return: dict of the state or None if the sprite has nothing to restore
+        """
+        return None
+
+
+class LabelProxy(_SpriteProxy):
+
+    def __init__(self, display, key, text=""):
+        super().__init__(display, key)
+        self._text = text
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._text = str(value)
+        self._set("text", self._text)
+
+    def snapshot(self):
+        return {"text": self._text}
+
+
+class TimerProxy(LabelProxy):
+
+    def __init__(self, display, key):
+        super().__init__(display, key, "0")
+
+    @property
+    def time(self):
+        return int(self.text)
+
+    @time.setter
+    def time(self, seconds):
+        self.text = str(seconds)
+
+
+class LogoProxy(_SpriteProxy):
+
+    def __init__(self, display, key):
+        super().__init__(display, key)
+        self.closed = True
+
+    def open(self):
+        self.closed = False
+        self._call("open")
+
+    def close(self):
+        self.closed = True
+        self._call("close")
+
+    def snapshot(self):
+        return {"closed": self.closed}
+
+
+class StrikesProxy(_SpriteProxy):
+
+    def show_strikes(self, num_strikes):
+        self._call("show_strikes", num_strikes)
+
+
+class _CardProxy(_SpriteProxy):
+
+    def __init__(self, display, key):
+        super().__init__(display, key)
+        self._phrase = ""
+        self._count = 0
+
+    @property
+    def phrase(self):
+        return self._phrase
+
+    @phrase.setter
+    def phrase(self, phrase):
+        self._phrase = phrase
+        self._set("phrase", phrase)
+
+    @property
+    def count(self):
+        return self._count
+
+    @count.setter
+    def count(self, count):
+        self._count = count
+        self._set("count", count)
+
+
+class MainCardProxy(_CardProxy):
+
+    def __init__(self, display, key):
+        super().__init__(display, key)
+        self._visible = False
+
+    @property
+    def valid(self):
+        return self.phrase and self.count
+
+    def from_response(self, response):
+        if not response:
+            self.phrase = ""
+            self.count = 0
+            return
+        self.phrase = response.phrase
+        self.count = response.count
+
+    def reveal(self):
+        self._visible = True
+        self._call("reveal")
+
+    def hide(self):
+        self._visible = False
+        self._call("hide")
+
+    def snapshot(self):
+        return {"phrase": self._phrase, "count": self._count, "visible": self._visible}
+
+
+class FastMoneyCardProxy(_CardProxy):
+
+    def __init__(self, display, key):
+        super().__init__(display, key)
+        self.reveal_stage = FastMoneyResponseCard.UNREVEALED
+
+    def reveal_phrase(self):
+        self.reveal_stage = FastMoneyResponseCard.PHRASE_REVEALED
+        self._call("reveal_phrase")
+
+    def reveal_value(self):
+        self.reveal_stage = FastMoneyResponseCard.COUNT_REVEALED
+        self._call("reveal_value")
+
+    def hide(self):
+        self.reveal_stage = FastMoneyResponseCard.UNREVEALED
+        self._call("hide")
+
+    def snapshot(self):
+        return {"phrase": self._phrase, "count": self._count, "reveal_stage": self.reveal_stage}
+
+
+class RemoteDisplay:
+    """
+    Runs the display in its own process so drawing does not compete with the control window for the interpreter.
+    Has the same sprites as the GraphicsManager for the control window to change, which keep their state here and send
+    the changes to the render process. If the render process stops, it is restarted with the state restored and its
+    frame outputs carrying on in new files.
+    """
+
+    # The longest to wait for the render process to answer a question
+    REPLY_TIMEOUT_SEC = 5
+
+    def __init__(self, resolution=None, headless=False, frame_rate=TICKS_PER_SEC, prerender_animations=False,
+                 idle_rendering=True):
+        """
+        Starts the render process
+
+        :param resolution: the screen resolution (tuple of width and height)
+        :param headless: whether to render offscreen without a window
+        :param frame_rate: the most frames to present per second
+        :param prerender_animations: whether to pre-render card animations into frame strips
+        :param idle_rendering: whether to stop presenting frames while nothing changes
+        """
+        self.frame_rate = frame_rate
+        self.restarts = 0
+        self._options = (resolution, headless, frame_rate, prerender_animations, idle_rendering)
+        self._state = GameState.PREPARING
+        # Tuples of the method name and arguments of the calls setting up the display (such as frame outputs),
+        # repeated when the render process is restarted
+        self._setup_calls = list()
+        self._questions = 0
+        self._connection = None
+        self._process = None
+        self._closed = False
+
+        self.id_display = LabelProxy(self, "id_display")
+        self.logo_split = LogoProxy(self, "logo_split")
+        self.strikes = StrikesProxy(self, "strikes")
+        self.master_score = LabelProxy(self, "master_score")
+        self.team_1_score = LabelProxy(self, "team_1_score")
+        self.team_2_score = LabelProxy(self, "team_2_score")
+        self.main_cards = list(MainCardProxy(self, "main_cards.{}".format(i)) for i in range(8))
+        self.fm_cards = list(FastMoneyCardProxy(self, "fm_cards.{}".format(i)) for i in range(10))
+        self.fm_timer = TimerProxy(self, "fm_timer")
+        self.fm_points = LabelProxy(self, "fm_points")
+        self._start()
+        # The render process is not a daemon (so it can start the recording process) so it must be stopped on exit
+        atexit.register(self.close)
+
+    def _sprites(self):
+        return [self.id_display, self.logo_split, self.strikes, self.master_score, self.team_1_score,
+                self.team_2_score, *self.main_cards, *self.fm_cards, self.fm_timer, self.fm_points]
+
+    def _start(self):
+        # The render process only sends back answers to ask
+        receiver, self._connection = Pipe()
+        self._process = Process(target=run_render_process, args=(receiver, *self._options))
+        self._process.start()
+        receiver.close()
+
+    def restart(self):
+        """
+        Starts a new render process showing the current state
+        """
+        self.restarts += 1
+        self._connection.close()
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process.join()
+        self._start()
+        self._connection.send(("state", self._state))
+        for sprite in self._sprites():
+            state = sprite.snapshot()
+            if state is not None:
+                self._connection.send(("restore", sprite.key, state))
+        for name, args in self._setup_calls:
+            self._connection.send(self._setup_message(name, args))
+
+    def check_running(self):
+        """
+        Restarts the render process if it has stopped
+        """
+        if not self._process.is_alive():
+            print("The display stopped (exit code {}) - restarting it".format(self._process.exitcode))
+            self.restart()
+
+    def send(self, message):
+        """
+        Sends a message to the render process, restarting it first if it has stopped
+        """
+        self.check_running()
+        try:
+            self._connection.send(message)
+        except (BrokenPipeError, EOFError, OSError):
+            self.restart()
+
+    def ask(self, name, *args):
+        """
+        Calls a GraphicsManager method in the render process and waits for its result
+
+        :return: the result or None if the render process did not answer in time
+        """
+        self._questions += 1
+        self.send(("ask", "", name, args, self._questions))
+        try:
+            while self._connection.poll(self.REPLY_TIMEOUT_SEC):
+                _, question, result = self._connection.recv()
+                # Answers to questions that timed out are skipped
+                if question == self._questions:
+                    return result
+        except (EOFError, OSError):
+            # The render process stopped and is restarted by the next message
+            pass
+        return None
+
+    def _setup(self, name, *args):
+        # Restart first if needed so the call is not also repeated by the restart
+        self.check_running()
+        self._setup_calls.append((name, args))
+        self.send(self._setup_message(name, args))
+
+    def _setup_message(self, name, args):
+        """
+        Gets the message making a setup call. After a restart the frame outputs carry on in new files rather than
+        replacing what was saved before the render process stopped.
+        """
+        if self.restarts and name == "record_to":
+            args = (continuation_path(args[0]),)
+        elif self.restarts and name == "save_frames_to":
+            args = (args[0], "restart{}_".format(self.restarts))
+        return ("setup", "", name, args)
+
+    def set_state(self, state):
+        """
+        Sets the game state the display shows
+        """
+        self._state = state
+        self.send(("state", state))
+
+    def wake(self):
+        # The render process wakes itself whenever a message arrives
+        pass
+
+    def change_resolution(self, resolution):
+        """
+        Switches the display to a new resolution while it keeps running (a restarted display uses it too)
+
+        :param resolution: the new resolution (tuple of width and height)
+
+        :raises ValueError: if the width or height is not more than 0
+        """
+        if resolution[0] <= 0 or resolution[1] <= 0:
+            raise ValueError("The resolution must be more than 0 wide and high: {}".format(tuple(resolution)))
+        self._options = (tuple(resolution),) + self._options[1:]
+        self.send(("call", "", "change_resolution", (tuple(resolution),)))
+
+    def set_stats_visible(self, visible):
+        self.send(("call", "", "set_stats_visible", (visible,)))
+
+    def save_stats_csv(self, path):
+        """
+        Saves the render stats of the render process as a CSV file
+
+        :return: true if saved
+        """
+        return bool(self.ask("save_stats_csv", path))
+
+    def save_frames_to(self, directory):
+        self._setup("save_frames_to", directory)
+
+    def share_frames_to(self, ring_path):
+        self._setup("share_frames_to", ring_path)
+
+    def record_to(self, video_path):
+        self._setup("record_to", video_path)
+
+    def record_sound(self, name):
+        self.send(("call", "", "record_sound", (name,)))
+
+    def close(self):
+        """
+        Stops the render process once it has finished its frame outputs (does nothing if already closed)
+        """
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        if self._process.is_alive():
+            # Not through send, which would restart a stopped render process
+            try:
+                self._connection.send(("quit",))
+            except (BrokenPipeError, EOFError, OSError):
+                pass
+            self._process.join()
+        self._connection.close()
+
+
+def _resolve(manager, key):
+    """
+    Gets the object in the GraphicsManager with the given key (an empty key for the manager itself)
+    """
+    if not key:
+        return manager
+    name, _, index = key.partition(".")
+    target = getattr(manager, name)
+    return target[int(index)] if index else target
+
+
+def _apply(manager, state, message, connection):
+    """
+    Applies a message from the control process to the display, answering it if it is a question
+    """
+    kind = message[0]
+    if kind == "state":
+        state[0] = message[1]
+    elif kind == "set":
+        _, key, name, value = message
+        setattr(_resolve(manager, key), name, value)
+    elif kind == "call":
+        _, key, name, args = message
+        getattr(_resolve(manager, key), name)(*args)
+    elif kind == "setup":
+        _, key, name, args = message
+        try:
+            getattr(_resolve(manager, key), name)(*args)
+        except Exception:
+            # It would fail again in a restarted display, so carry on without it
+            traceback.print_exc()
+            print("Could not set up the display ({}) - carrying on without it".format(name))
+    elif kind == "ask":
+        _, key, name, args, question = message
+        connection.send(("answer", question, getattr(_resolve(manager, key), name)(*args)))
+    elif kind == "restore":
+        _, key, sprite_state = message
+        _resolve(manager, key).restore(sprite_state)
+
+
+def run_render_process(connection, resolution, headless, frame_rate, prerender_animations, idle_rendering):
+    """
+    Runs the display until told to quit (the target of the render process).
+    A thread applies the received messages - the sprite methods they call post their drawing to the display thread.
+    """
+    if headless:
+        use_headless_drivers()
+    pygame.init()
+    manager = GraphicsManager(resolution, headless=headless, frame_rate=frame_rate,
+                              prerender_animations=prerender_animations)
+    state = [GameState.PREPARING]
+    quitting = Event()
+
+    def receive():
+        while not quitting.is_set():
+            try:
+                message = connection.recv()
+            except (EOFError, OSError):
+                # The control process has gone
+                message = ("quit",)
+            try:
+                _apply(manager, state, message, connection)
+            except Exception:
+                # Stop so the control process restarts the display rather than it silently ignoring changes
+                traceback.print_exc()
+                quitting.set()
+            if message[0] == "quit":
+                quitting.set()
+            manager.wake()
+
+    Thread(target=receive, daemon=True).start()
+    try:
+        while not quitting.is_set():
+            manager.run_frame(state[0], idle_rendering)
+    finally:
+        # Finish the frame outputs even if interrupted (exit handlers are not run in a child process)
+        manager.close()
+        pygame.quit()
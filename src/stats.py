@@ -0,0 +1,201 @@
+import csv
+from collections import deque
+from threading import Lock
+from time import perf_counter
+
+
+class TimingSeries:
+    """
+    A rolling window of timings plus totals over all time
+    """
+
+    def __init__(self, history):
+        """
+        Creates an empty series
+
+        :param history: the number of most recent timings kept for percentiles
+        """
+        self.recent = deque(maxlen=history)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.recent.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """
+        Gets a percentile of the recent timings
+
+        :param percent: the percentile from 0 to 100
+
+        :return: the timing in seconds (0 if there are none)
+        """
+        recent = sorted(self.recent)
+        if not recent:
+            return 0.0
+        return recent[min(len(recent) - 1, int(len(recent) * percent / 100))]
+
+
+class RenderStats:
+    """
+    Timing instrumentation for the display: frame times, frame phases, sprite classes, command latency and
+    dropped frames, plus the hits and misses of the display's caches
+    """
+
+    # Number of recent frames that percentiles and the histogram are calculated over
+    HISTORY = 600
+    # Upper bounds in milliseconds of the frame time histogram buckets
+    HISTOGRAM_BUCKETS_MS = (2, 4, 8, 16, 33, 50, 100, 250, float("inf"))
+    PHASES = ("commands", "update", "draw", "present")
+
+    def __init__(self, frame_budget):
+        """
+        Creates empty statistics
+
+        :param frame_budget: the time in seconds a frame may take before it counts as dropped
+        """
+        self.frame_budget = frame_budget
+        self.frames = TimingSeries(self.HISTORY)
+        self.phases = {phase: TimingSeries(self.HISTORY) for phase in self.PHASES}
+        # Time from a display command being posted to it being applied
+        self.command_latency = TimingSeries(self.HISTORY)
+        self.sprites = {}
+        self.dropped_frames = 0
+        # Caches counting their hits and misses by name
+        self.caches = {}
+        self._lock = Lock()
+
+    def add_cache(self, name, cache):
+        """
+        Reports the hits and misses of a cache along with the timings
+
+        :param name: the name to report the cache by
+        :param cache: the cache, which has hits and misses attributes
+        """
+        self.caches[name] = cache
+
+    def add_frame(self, phase_times, frame_time):
+        """
+        Records the timing of a frame
+
+        :param phase_times: dict of the seconds spent in each frame phase
+        :param frame_time: the total seconds of work for the frame
+        """
+        for phase, seconds in phase_times.items():
+            self.phases[phase].add(seconds)
+        self.frames.add(frame_time)
+        if frame_time > self.frame_budget:
+            self.dropped_frames += 1
+
+    def add_sprite_time(self, sprite_class, kind, seconds):
+        """
+        Records time spent by a sprite
+
+        :param sprite_class: the name of the sprite's class
+        :param kind: what the sprite was doing ("update" or "draw")
+        :param seconds: the time spent
+        """
+        with self._lock:
+            key = (sprite_class, kind)
+            if key not in self.sprites:
+                self.sprites[key] = TimingSeries(self.HISTORY)
+            self.sprites[key].add(seconds)
+
+    def instrument_sprite(self, sprite):
+        """
+        Wraps the update and render methods of the sprite so they are timed.
+        The render method is where a sprite draws its image so it is recorded as draw time
+        (update time includes any drawing the update causes).
+
+        :param sprite: the sprite to instrument
+        """
+        sprite_class = type(sprite).__name__
+        for method_name, kind in (("update", "update"), ("render", "draw")):
+            method = getattr(sprite, method_name, None)
+            if method is not None:
+                setattr(sprite, method_name, self._timed(method, sprite_class, kind))
+
+    def _timed(self, method, sprite_class, kind):
+        def timed_method(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.add_sprite_time(sprite_class, kind, perf_counter() - start)
+
+        return timed_method
+
+    def histogram(self):
+        """
+        Counts the recent frames falling in each of the histogram buckets
+
+        :return: list of the bucket upper bounds in milliseconds paired with their counts
+        """
+        counts = [0] * len(self.HISTOGRAM_BUCKETS_MS)
+        for seconds in self.frames.recent:
+            milliseconds = seconds * 1000
+            for i, bound in enumerate(self.HISTOGRAM_BUCKETS_MS):
+                if milliseconds <= bound:
+                    counts[i] += 1
+                    break
+        return list(zip(self.HISTOGRAM_BUCKETS_MS, counts))
+
+    def summary_lines(self):
+        """
+        Gets a short text summary of the statistics
+
+        :return: list of lines of text
+        """
+        frames = self.frames
+        phases = " ".join("{} {:.1f}".format(phase, self.phases[phase].percentile(95) * 1000)
+                          for phase in self.PHASES)
+        return ["frame p50 {:.1f} p95 {:.1f} max {:.1f} ms | dropped {}".format(
+                    frames.percentile(50) * 1000, frames.percentile(95) * 1000, frames.max * 1000,
+                    self.dropped_frames),
+                "p95 {} ms | command latency max {:.1f} ms".format(phases, self.command_latency.max * 1000),
+                *("{} cache hits {} misses {} ({:.0%})".format(name, cache.hits, cache.misses,
+                                                              cache.hits / max(1, cache.hits + cache.misses))
+                  for name, cache in self.caches.items())]
+
+    def write_csv(self, path):
+        """
+        Writes all the statistics to a CSV file
+
+        :param path: the path to save to
+
+        :return: boolean success of saving
+        """
+        rows = [("section", "name", "count", "mean_ms", "p50_ms", "p95_ms", "max_ms")]
+
+        def series_row(section, name, series):
+            return (section, name, series.count, series.mean * 1000, series.percentile(50) * 1000,
+                    series.percentile(95) * 1000, series.max * 1000)
+
+        rows.append(series_row("frame", "total", self.frames))
+        for phase in self.PHASES:
+            rows.append(series_row("phase", phase, self.phases[phase]))
+        rows.append(series_row("command", "latency", self.command_latency))
+        with self._lock:
+            for (sprite_class, kind), series in sorted(self.sprites.items()):
+                rows.append(series_row("sprite_" + kind, sprite_class, series))
+        for bound, count in self.histogram():
+            rows.append(("histogram", "<= {} ms".format(bound), count, "", "", "", ""))
+        rows.append(("frame", "dropped", self.dropped_frames, "", "", "", ""))
+        for name, cache in self.caches.items():
+            rows.append(("cache_hits", name, cache.hits, "", "", "", ""))
+            rows.append(("cache_misses", name, cache.misses, "", "", "", ""))
+        try:
+            with open(path, "w", newline="") as file:
+                csv.writer(file).writerows(rows)
+            return True
+        except OSError:
+            print("Path (" + path + ") could not be saved to")
+        return False
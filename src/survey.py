@@ -1,8 +1,58 @@
+import hashlib
 import json
 import os
-import pathlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+from types import MappingProxyType
 
-SURVEY_DIR = r"surveys\\"
+from src import profiling
+
+SURVEY_DIR = "surveys"
+SURVEY_EXTENSION = ".survey"
+# Survey files are read by this many threads at once, as most of reading them is waiting on the disk or network
+LOAD_WORKERS = 16
+# The loaded surveys are updated at most about this many times while loading so lists can fill in as files are read
+LOAD_UPDATES = 20
+_MIN_LOAD_BATCH = 64
+
+# What was read of a survey file, so it is only read again when it changes. The survey is None if it was invalid.
+_ManifestEntry = namedtuple("_ManifestEntry", ["mtime", "size", "digest", "survey"])
+
+# The names of the surveys that changed in a reload
+SurveyChanges = namedtuple("SurveyChanges", ["added", "changed", "removed"])
+
+
+class _SurveyRegistry:
+    """
+    The loaded surveys by name, indexed by their IDs and by the digests of the files they were read from so finding and
+    de-duplicating surveys does not search through them all
+    """
+
+    def __init__(self):
+        self.by_name = dict()
+        self.by_id = dict()
+        self.by_digest = dict()
+
+    def add(self, name, survey):
+        """
+        Adds a survey unless one with the same ID is already loaded, replacing any survey with the same name
+
+        :return: true if added
+        """
+        if survey.id in self.by_id:
+            return False
+        replaced = self.by_name.get(name)
+        if replaced is not None:
+            del self.by_id[replaced.id]
+            if self.by_digest.get(replaced.digest) is replaced:
+                del self.by_digest[replaced.digest]
+        self.by_name[name] = survey
+        self.by_id[survey.id] = survey
+        if survey.digest is not None:
+            self.by_digest[survey.digest] = survey
+        return True
 
 
 class Survey:
@@ -10,9 +60,18 @@ class Survey:
     Represents survey data from .survey data files
     """
 
+    __slots__ = ("question", "id", "digest", "_num_responses", "_response_data", "_load_responses", "_responses")
+
     NONE = None
 
-    _surveys = {}
+    _registry = _SurveyRegistry()
+    # The file path (or library name) to manifest entry of each survey read by load_all
+    _manifest = {}
+    # The SurveyLibrary surveys are loaded from instead of the surveys folder, if any
+    _library = None
+    # Increases whenever the loaded surveys change so lists of them know when to refresh
+    generation = 0
+    _load_lock = Lock()
 
     def __init__(self, data):
         """
@@ -21,11 +80,80 @@ class Survey:
         :param data: survey data from file
         """
         self.question = data.get("question", "[INVALID QUESTION]")
-        self.id = data.get("id", hash(str(data)))
-        self.responses = []
-        responses = data.get("responses", [])
-        for i in range(len(responses)):
-            self.responses.append(Response(self, responses[i]["response"], responses[i]["count"], i + 1))
+        self.id = data["id"] if "id" in data else self.content_id(data)
+        # The digest of the contents of the file (or library record) the survey was loaded from, if it was
+        self.digest = None
+        # Tuples of the phrase and count of each response, made into Responses when first used
+        self._response_data = [(response["response"], response["count"]) for response in data.get("responses", [])]
+        self._num_responses = len(self._response_data)
+        self._load_responses = None
+        self._responses = None
+
+    @classmethod
+    def from_summary(cls, survey_id, question, num_responses, digest, load_responses):
+        """
+        Creates a survey from its details without reading its responses, which are loaded when first used
+
+        :param survey_id: the survey's ID
+        :param question: the survey question
+        :param num_responses: the number of responses
+        :param digest: the digest of the survey's contents
+        :param load_responses: function returning tuples of the phrase and count of each response
+        """
+        survey = cls.__new__(cls)
+        survey.question = question
+        survey.id = survey_id
+        survey.digest = digest
+        survey._num_responses = num_responses
+        survey._response_data = None
+        survey._load_responses = load_responses
+        survey._responses = None
+        return survey
+
+    @classmethod
+    def from_contents(cls, contents):
+        """
+        Creates a survey from the contents of a survey file
+
+        :param contents: the bytes of the file
+
+        :raises ValueError: if the contents are not valid survey data
+        """
+        try:
+            survey = cls(json.loads(contents.decode()))
+        except (KeyError, TypeError, AttributeError) as error:
+            raise ValueError("Not valid survey data") from error
+        survey.digest = contents_digest(contents)
+        return survey
+
+    @staticmethod
+    def content_id(data):
+        """
+        Gets an ID for survey data that has none from a hash of its question and responses, so the same survey gets the
+        same ID on every run and machine
+
+        :param data: survey data from file
+
+        :return: the ID as a string of hex digits
+        """
+        canonical = json.dumps([data.get("question"), [[response.get("response"), response.get("count")]
+                                                      for response in data.get("responses", [])]],
+                               separators=(",", ":"), ensure_ascii=False)
+        return hashlib.blake2b(canonical.encode(), digest_size=6).hexdigest()
+
+    @property
+    def responses(self):
+        """
+        Get the responses, which are made when first used (such as when previewing the survey) rather than when loading
+
+        :return: list of the responses in order of rank
+        """
+        if self._responses is None:
+            data = self._response_data if self._response_data is not None else self._load_responses()
+            self._responses = [Response(self, phrase, count, rank) for rank, (phrase, count) in enumerate(data, 1)]
+            self._response_data = self._load_responses = None
+            self._num_responses = len(self._responses)
+        return self._responses
 
     @property
     def num_responses(self):
@@ -34,7 +162,14 @@ class Survey:
 
         :return: number of responses
         """
-        return len(self.responses)
+        return self._num_responses
+
+    def to_data(self):
+        """
+        :return: the survey data as saved in survey files
+        """
+        return {"question": self.question, "id": self.id,
+                "responses": [{"response": response.phrase, "count": response.count} for response in self.responses]}
 
     def save_to_file(self, path):
         """
@@ -44,11 +179,9 @@ class Survey:
 
         :return: boolean success of saving
         """
-        data = {"question": self.question, "id": self.id,
-                "responses": [{"response": response.phrase, "count": response.count} for response in self.responses]}
         try:
             file = open(path, 'w')
-            json.dump(data, file)
+            json.dump(self.to_data(), file)
             file.close()
             return True
         except OSError:
@@ -71,34 +204,178 @@ class Survey:
     @classmethod
     def get_surveys(cls):
         """
-        Get a copy of the survey list
+        Get the survey list
+
+        :return: a read only snapshot of the loaded surveys by name - loading swaps in new surveys rather than changing
+        these (only load_survey_file adds to them), so call again for the latest
+        """
+        return MappingProxyType(cls._registry.by_name)
+
+    @classmethod
+    def find_by_id(cls, survey_id):
+        """
+        :return: the loaded survey with the given ID or None if there is not one
+        """
+        return cls._registry.by_id.get(survey_id)
 
-        :return: a copy of the survey list
+    @classmethod
+    def find_by_digest(cls, digest):
+        """
+        :return: the loaded survey read from a file with the given contents digest or None if there is not one
         """
-        return cls._surveys.copy()
+        return cls._registry.by_digest.get(digest)
 
     @classmethod
     def clear_surveys(cls):
         """
         Clear all the loaded surveys.
         """
-        cls._surveys.clear()
+        cls._registry = _SurveyRegistry()
+        cls._manifest.clear()
+        cls.generation += 1
 
     @classmethod
-    def load_all(cls):
+    def use_library(cls, library):
         """
-        Load all survey files in the surveys folder.
+        Load surveys from a survey library instead of the surveys folder
+
+        :param library: the SurveyLibrary to use or None to use the surveys folder
         """
-        for path in pathlib.Path(SURVEY_DIR).glob("*.survey"):
-            Survey.load_survey_file(str(path.resolve()))
+        with cls._load_lock:
+            cls._library = library
+            cls.clear_surveys()
 
     @classmethod
-    def reload_all(cls):
+    def load_all(cls, progress=None):
         """
-        Clear all loaded surveys then load all.
+        Load all surveys in the survey library if one is used, otherwise all survey files in the surveys folder. Only
+        the surveys that are new or changed since they were last loaded are read and removed surveys are dropped.
+        Survey files are read by a pool of threads and the loaded surveys are updated as batches of them are read,
+        always in the order of the file names. It is safe to call from any thread.
+
+        :param progress: function called (on the calling thread) with the number of surveys read so far and the number
+        to read whenever a batch of them has been read
+
+        :return: SurveyChanges of the names of the surveys added, changed and removed
         """
-        cls.clear_surveys()
-        cls.load_all()
+        with cls._load_lock, profiling.phase("load surveys"):
+            if cls._library is not None:
+                return cls._load_library(progress)
+            return cls._load_folder(progress)
+
+    @classmethod
+    def _load_folder(cls, progress):
+        previous = cls._manifest
+        paths = list()
+        manifest = dict()
+        to_read = list()
+        for entry in _survey_files():
+            paths.append(entry.path)
+            # Comes from the directory listing on Windows so unchanged files are never opened
+            stat = entry.stat()
+            known = previous.get(entry.path)
+            if known and known.mtime == stat.st_mtime_ns and known.size == stat.st_size:
+                manifest[entry.path] = known
+            else:
+                to_read.append((entry.path, stat, known))
+        listed = set(paths)
+        added, changed = list(), list()
+        removed = [_survey_name(path) for path, entry in previous.items()
+                   if path not in listed and entry.survey is not None]
+        changes_to_publish = bool(removed)
+
+        batch_size = max(_MIN_LOAD_BATCH, -(-len(to_read) // LOAD_UPDATES))
+        # Renamed or copied files have the same contents as surveys already loaded, which are used again
+        loaded = dict(cls._registry.by_digest)
+        with ThreadPoolExecutor(LOAD_WORKERS) as pool:
+            # Results come back in the order the files were listed in however long each takes to read
+            results = pool.map(partial(_read_survey_file, loaded=loaded), [path for path, _, _ in to_read],
+                               [known.digest if known else None for _, _, known in to_read])
+            for count, ((path, stat, known), result) in enumerate(zip(to_read, results), 1):
+                if result is None:
+                    if known is not None and known.survey is not None:
+                        removed.append(_survey_name(path))
+                        changes_to_publish = True
+                elif known and known.digest == result[0]:
+                    # Saved again without changes
+                    manifest[path] = known._replace(mtime=stat.st_mtime_ns, size=stat.st_size)
+                else:
+                    digest, survey = result
+                    manifest[path] = _ManifestEntry(stat.st_mtime_ns, stat.st_size, digest, survey)
+                    changes_to_publish |= _note_change(_survey_name(path), known, survey, added, changed, removed)
+                if count % batch_size == 0 or count == len(to_read):
+                    if changes_to_publish:
+                        # Files not read yet keep their previous survey until they are
+                        unread = {unread_path: entry for unread_path, _, entry in to_read[count:] if entry}
+                        cls._publish((_survey_name(path), manifest.get(path) or unread.get(path)) for path in paths)
+                        changes_to_publish = False
+                    if progress:
+                        progress(count, len(to_read))
+        cls._manifest = manifest
+        if changes_to_publish:
+            cls._publish((_survey_name(path), manifest.get(path)) for path in paths)
+        return cls._listed_changes(added, changed, removed)
+
+    @classmethod
+    def _load_library(cls, progress):
+        previous = cls._manifest
+        manifest = dict()
+        added, changed, removed = list(), list(), list()
+        changes_to_publish = False
+        # Only the details listed are read, each survey's responses are read from the library when first used
+        listing = [summary for summary in cls._library.summaries() if _listable(summary[2], summary[3])]
+        for name, survey_id, question, num_responses, digest in listing:
+            known = previous.get(name)
+            if known and known.digest == digest:
+                manifest[name] = known
+                continue
+            survey = Survey.from_summary(survey_id, question, num_responses, digest,
+                                         partial(cls._library.read_responses, name))
+            manifest[name] = _ManifestEntry(None, None, digest, survey)
+            changes_to_publish |= _note_change(name, known, survey, added, changed, removed)
+        if progress:
+            progress(len(listing), len(listing))
+        removed += [name for name, entry in previous.items() if name not in manifest and entry.survey is not None]
+        cls._manifest = manifest
+        if changes_to_publish or removed:
+            cls._publish((summary[0], manifest[summary[0]]) for summary in listing)
+        return cls._listed_changes(added, changed, removed)
+
+    @classmethod
+    def reload_all(cls, progress=None):
+        """
+        Bring the loaded surveys up to date with the survey files or library.
+
+        :param progress: function called with the number of surveys read so far and the number to read as they are read
+
+        :return: SurveyChanges of the names of the surveys added, changed and removed
+        """
+        return cls.load_all(progress)
+
+    @classmethod
+    def _publish(cls, entries):
+        """
+        Replace the loaded surveys, skipping surveys already loaded under another name.
+        The surveys are swapped in at once so other threads never see them part way through changing.
+
+        :param entries: tuples of the name and manifest entry (or None) of each survey in order
+        """
+        registry = _SurveyRegistry()
+        for name, entry in entries:
+            if entry is not None and entry.survey is not None:
+                registry.add(name, entry.survey)
+        cls._registry = registry
+        cls.generation += 1
+
+    @classmethod
+    def _listed_changes(cls, added, changed, removed):
+        """
+        :return: SurveyChanges of the names, leaving out the surveys added or changed that were skipped as already
+        loaded under another name
+        """
+        listed = cls._registry.by_name
+        return SurveyChanges([name for name in added if name in listed], [name for name in changed if name in listed],
+                             removed)
 
     @classmethod
     def load_survey_file(cls, path):
@@ -110,23 +387,114 @@ class Survey:
         :return: survey or none if unsuccessful
         """
         try:
-            file = open(path)
-            s = Survey(json.load(file))
+            file = open(path, "rb")
+            contents = file.read()
             file.close()
-            if s not in cls._surveys.values():
-                cls._surveys[os.path.basename(path).rsplit(".")[0]] = s
+            s = cls.find_by_digest(contents_digest(contents))
+            if s is None:
+                s = Survey.from_contents(contents)
+            if cls._registry.add(_survey_name(path), s):
+                cls.generation += 1
             return s
         except OSError:
             print("File (" + path + ") could not be opened")
         return None
 
 
+def _survey_files():
+    """
+    :return: list of the directory entries of the survey files in the surveys folder in order of their names
+    """
+    try:
+        with os.scandir(SURVEY_DIR) as listing:
+            return sorted((entry for entry in listing if entry.name.endswith(SURVEY_EXTENSION) and entry.is_file()),
+                          key=lambda entry: entry.name)
+    except OSError:
+        print("Survey folder (" + SURVEY_DIR + ") could not be read")
+    return []
+
+
+def _read_survey_file(path, known_digest, loaded):
+    """
+    Reads and parses a survey file (on the threads of the loading pool)
+
+    :param path: the path of the survey file
+    :param known_digest: the digest of the file when last read, whose survey is not parsed again
+    :param loaded: dict of the loaded surveys by the digests of their files, used instead of parsing files with the
+    same contents
+
+    :return: tuple of the file's digest and its survey (None if not valid, not listed or not parsed again), or None if
+    the file could not be opened
+    """
+    try:
+        with open(path, "rb") as file:
+            contents = file.read()
+    except OSError:
+        print("File (" + path + ") could not be opened")
+        return None
+    digest = contents_digest(contents)
+    if digest == known_digest:
+        return digest, None
+    if digest in loaded:
+        return digest, loaded[digest]
+    try:
+        survey = Survey.from_contents(contents)
+    except ValueError:
+        print("File (" + path + ") is not a valid survey")
+        return digest, None
+    if not _listable(survey.question, survey.num_responses):
+        print("File (" + path + ") has no question or responses so is not listed")
+        return digest, None
+    return digest, survey
+
+
+def _note_change(name, known, survey, added, changed, removed):
+    """
+    Adds the name of a survey that was read again to the list of how it changed
+
+    :param known: the manifest entry from when it was last read or None
+    :param survey: the survey read or None if it was not valid
+
+    :return: true if the loaded surveys need updating
+    """
+    was_valid = known is not None and known.survey is not None
+    if survey is not None:
+        (changed if was_valid else added).append(name)
+    elif was_valid:
+        removed.append(name)
+    return survey is not None or was_valid
+
+
+def contents_digest(contents):
+    """
+    :return: the digest identifying the contents of a survey file
+    """
+    return hashlib.blake2b(contents, digest_size=16).digest()
+
+
+def _listable(question, num_responses):
+    """
+    :return: whether a survey is listed - ones without a question or responses are left out whether they are loaded
+    from the surveys folder or a survey library
+    """
+    return bool(question) and num_responses > 0
+
+
+def _survey_name(path):
+    """
+    :return: the name a survey is listed by from the path of its file
+    """
+    return os.path.basename(path).rsplit(".")[0]
+
+
 class Response:
     """
     A response from a survey.
     Acts as a data structure for response info.
     """
 
+    __slots__ = ("survey", "phrase", "count", "rank")
+
     BLANK_PHRASE = "<Empty Response>"
 
     def __init__(self, survey: Survey, phrase: str, count: int, rank: int):